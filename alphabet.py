@@ -0,0 +1,151 @@
+import re
+import string
+import numpy as np
+
+# Preset alphabets, in shift order
+ALPHABETS = {
+    'english': string.ascii_lowercase + ' ',
+    'lowercase': string.ascii_lowercase,
+    'uppercase': string.ascii_uppercase,
+    'alphanumeric': string.ascii_lowercase + string.ascii_uppercase + string.digits,
+    'printable': ''.join(map(chr, range(32, 127))),
+    'greek': 'αβγδεζηθικλμνξοπρστυφχψω',
+    'cyrillic': 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+}
+
+POLICIES = ('passthrough', 'strip', 'strict')
+
+class Alphabet:
+
+    def __init__(self, symbols, policy = 'passthrough'):
+        '''
+        This is the initialising constructor. Every table needed to shift and index texts is built here
+        once, so that the bulk translate paths work on any alphabet.
+        self.index (dictionary): Symbol to index mapping, in shift order.
+        self.shift_tables (list): str.translate tables, one for every rotation factor.
+        self.byte_shift_tables (list): bytes.translate tables, one for every rotation factor (ASCII alphabets only).
+        self.index_table (bytes): bytes.translate table mapping every byte to its index, 255 if unknown (ASCII alphabets only).
+        self.code_table (np.ndarray): index of every code point up to the largest symbol, len(symbols) if unknown.
+        Args:
+            symbols (str): The symbols, in shift order, without duplicates
+            policy (str): What shifting does with symbols outside the alphabet: 'passthrough' leaves
+                them untouched, 'strip' removes them and 'strict' raises a ValueError
+        '''
+        if len(set(symbols)) != len(symbols) or not symbols:
+            raise ValueError("An alphabet needs distinct symbols")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy for symbols outside the alphabet: {policy}")
+        self.symbols = symbols
+        self.size = len(symbols)
+        self.policy = policy
+        self.index = {ch: i for i, ch in enumerate(symbols)}
+        self.ascii = symbols.isascii() and self.size < 255
+
+        self.shift_tables = []
+        self.byte_shift_tables = []
+        for n in range(self.size):
+            shifted = symbols[n:] + symbols[:n]
+            self.shift_tables.append(str.maketrans(symbols, shifted))
+            if self.ascii:
+                self.byte_shift_tables.append(bytes.maketrans(symbols.encode(), shifted.encode()))
+
+        self.index_table = None
+        self.known_bytes = None
+        self.unknown_bytes = None
+        if self.ascii:
+            index_table = bytearray([255] * 256)
+            for ch, i in self.index.items():
+                index_table[ord(ch)] = i
+            self.index_table = bytes(index_table)
+            self.known_bytes = symbols.encode()
+            self.unknown_bytes = bytes(b for b in range(256) if index_table[b] == 255)
+        self.code_table = np.full(max(map(ord, symbols)) + 2, self.size, dtype=np.intp)
+        self.code_table[[ord(ch) for ch in symbols]] = np.arange(self.size)
+        self.unknown_pattern = re.compile(f"[^{re.escape(symbols)}]")
+
+    def normalise(self, text):
+        '''
+        This function applies the policy to the symbols of a text which are outside the alphabet.
+        Args:
+            text (str or bytes): The text
+        Return:
+            The text, without its unknown symbols under the 'strip' policy
+        Raises:
+            ValueError: under the 'strict' policy, if the text holds an unknown symbol
+        '''
+        if self.policy == 'passthrough':
+            return text
+        if isinstance(text, bytes):
+            if not self.ascii:
+                raise TypeError('bytes can only be used with an ASCII alphabet')
+            if self.policy == 'strip':
+                return text.translate(None, self.unknown_bytes)
+            if text.translate(None, self.known_bytes):
+                raise ValueError(f"Symbol outside the alphabet in {text[:20]!r}")
+            return text
+        if self.policy == 'strip':
+            return self.unknown_pattern.sub('', text)
+        match = self.unknown_pattern.search(text)
+        if match:
+            raise ValueError(f"Symbol outside the alphabet: {match.group()!r} at position {match.start()}")
+        return text
+
+    def fold_case(self, text):
+        '''
+        This function brings a text to the case of the alphabet, unless the alphabet has both cases.
+        Args:
+            text (str): The text
+        Return:
+            The text in lower case for a lower case alphabet, in upper case for an upper case one,
+            else unchanged
+        '''
+        if self.symbols == self.symbols.lower():
+            return text.lower()
+        if self.symbols == self.symbols.upper():
+            return text.upper()
+        return text
+
+    def shift(self, text, n):
+        '''
+        This function shifts every symbol of a text by 'n' using the precomputed tables,
+        the symbols outside the alphabet being handled by the policy.
+        Args:
+            text (str or bytes): The text to be shifted
+            n (int): The rotation factor (negative to shift backwards)
+        Return:
+            The shifted text
+        '''
+        n = n % self.size
+        text = self.normalise(text)
+        if isinstance(text, str):
+            return text.translate(self.shift_tables[n])
+        return text.translate(self.byte_shift_tables[n])
+
+    def indices(self, text):
+        '''
+        This function converts a text into an array of alphabet indices.
+        Args:
+            text (str or bytes): The text to be converted
+        Return:
+            An integer array holding the index of every character, at least self.size for the
+            characters outside the alphabet
+        '''
+        if self.ascii:
+            if isinstance(text, str):
+                text = text.encode()
+            return np.frombuffer(text.translate(self.index_table), dtype=np.uint8)
+        if isinstance(text, bytes):
+            text = text.decode()
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        return self.code_table[np.minimum(codes, len(self.code_table) - 1)]
+
+def get_alphabet(name, policy = 'passthrough'):
+    '''
+    This function builds a preset alphabet.
+    Args:
+        name (str): A key of ALPHABETS
+        policy (str): 'passthrough', 'strip' or 'strict' (see Alphabet)
+    Return:
+        The Alphabet
+    '''
+    return Alphabet(ALPHABETS[name], policy)
@@ -0,0 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import sys
+from cipher import CaesarCipher, read_message
+from hill_climb import HillClimbing, solve_quad
+from inputs import list_files
+from strategies import STRATEGIES
+from wordlist import WordValidator
+
+METHODS = ('frequency', 'bigram', 'quad')
+
+# tables of a worker process, loaded once by init_worker
+_worker = {}
+
+def checkpoint_file(checkpoint_dir, file_name):
+    '''
+    This function names the checkpoint of the quad search of a file.
+    Args:
+        checkpoint_dir (str): The directory of the checkpoints, None for no checkpoint
+        file_name (str): The file containing the ciphertext
+    Return:
+        The checkpoint file, None without a directory
+    '''
+    if checkpoint_dir is None:
+        return None
+    name = os.path.normpath(file_name).replace(os.sep, '_').lstrip('._')
+    return os.path.join(checkpoint_dir, name + '.json')
+
+def init_worker(method, options):
+    '''
+    This function loads the tables needed by the cracking method, once per worker process.
+    Args:
+        method (str): 'frequency', 'bigram' or 'quad'
+        options (dict): The options of the method, with the table files ('quadgrams', 'frequency_file',
+            'bigram_file') if they are not the shipped ones
+    '''
+    _worker['method'] = method
+    _worker['options'] = options
+    if method == 'quad':
+        _worker['scorer'] = HillClimbing(options.get('quadgrams', 'frequencies/english_quadgrams.txt'))
+        _worker['validator'] = WordValidator() if options.get('validate') else None
+    else:
+        _worker['cipher'] = CaesarCipher(frequency_file=options.get('frequency_file', 'frequencies/letter_frequencies.csv'),
+                                         bigram_file=options.get('bigram_file', 'frequencies/bigram_frequency.csv'))
+
+def crack_file(file_name):
+    '''
+    This function cracks one file with the method loaded by init_worker.
+    Args:
+        file_name (str): The file containing the ciphertext
+    Return:
+        The result as a dict which can be dumped as JSON, with an 'error' entry if the file could not be cracked
+    '''
+    method = _worker['method']
+    options = _worker['options']
+    record = {'file': file_name, 'method': method}
+    try:
+        if method == 'quad':
+            with open(file_name) as f:
+                cipher = f.read().strip().upper()
+            result = solve_quad(cipher, scorer=_worker['scorer'], seed=options['seed'],
+                                restarts=options['restarts'], time_limit=options['time_limit'],
+                                strategy=STRATEGIES[options['strategy']](), validator=_worker['validator'],
+                                checkpoint=checkpoint_file(options.get('checkpoint_dir'), file_name),
+                                resume=options.get('resume', False))
+            record.update(key=''.join(result.key), score=result.score, plaintext=result.plaintext.lower(),
+                          restarts=result.restarts, evaluations=result.evaluations, stop_reason=result.stop_reason)
+        else:
+            cipher_obj = _worker['cipher']
+            cipher_text = read_message(file_name)
+            if method == 'frequency':
+                plain, n, scores = cipher_obj.crack_caesar_frequency(cipher_text)
+            else:
+                plain, n, scores = cipher_obj.crack_caesar_bigram(cipher_text, options['bigram_weighting'])
+            record.update(shift=n, score=scores[n], plaintext=plain)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+def crack_batch(files, method, options, workers = None):
+    '''
+    This function cracks files over a pool of worker processes.
+    Args:
+        files (list): The files containing the ciphertexts
+        method (str): 'frequency', 'bigram' or 'quad'
+        options (dict): The options of the method
+        workers (int): The number of processes, None for one per core
+    Return:
+        A generator of the results, in the order of the files
+    '''
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        init_worker(method, options)
+        yield from map(crack_file, files)
+        return
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(method, options)) as executor:
+        yield from executor.map(crack_file, files, chunksize=max(1, len(files) // (8 * workers)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crack every ciphertext of directories or glob patterns and write JSON Lines results")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of the files containing the ciphertexts")
+    parser.add_argument('-m', '--method', choices=METHODS, default='frequency', help="Cracking method")
+    parser.add_argument('-o', '--output', type=str, help="JSON Lines file for the results (stdout by default)")
+    parser.add_argument('-j', '--workers', type=int, default=0, help="Number of worker processes (0 for one per core)")
+    parser.add_argument('--bigram-weighting', choices=['presence', 'count'], default='presence',
+                        help="Score each distinct bigram once (presence) or every occurrence (count)")
+    parser.add_argument('--frequency-file', type=str, default='frequencies/letter_frequencies.csv',
+                        help="Letter frequency CSV of the frequency method (see build_model.py)")
+    parser.add_argument('--bigram-file', type=str, default='frequencies/bigram_frequency.csv',
+                        help="Bigram frequency CSV of the bigram method (see build_model.py)")
+    parser.add_argument('--quadgrams', type=str, default='frequencies/english_quadgrams.txt',
+                        help="Quadgram counts of the quad method (see build_model.py)")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='anneal', help="Search run by every quad restart")
+    parser.add_argument('--restarts', type=int, default=10, help="Number of quad restarts per file")
+    parser.add_argument('--time-limit', type=float, help="Seconds after which the quad search of a file stops")
+    parser.add_argument('--validate', action='store_true', help="Stop the quad search of a file once a new best key, polished, decrypts to a plaintext recognised by the wordlist")
+    parser.add_argument('--seed', type=int, help="Seed of the quad restarts")
+    parser.add_argument('--checkpoint-dir', type=str, help="Directory where the state of the quad search of every file is saved")
+    parser.add_argument('--resume', action='store_true', help="Go on from the checkpoints of a previous batch")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume needs --checkpoint-dir")
+    # the tables are loaded by the worker processes, where a missing file would break the pool
+    for table in (args.frequency_file, args.bigram_file, args.quadgrams):
+        if not os.path.isfile(table):
+            parser.error(f"no such table file: {table}")
+
+    options = {'bigram_weighting': args.bigram_weighting, 'strategy': args.strategy, 'restarts': args.restarts,
+               'time_limit': args.time_limit, 'seed': args.seed, 'validate': args.validate,
+               'checkpoint_dir': args.checkpoint_dir, 'resume': args.resume, 'frequency_file': args.frequency_file,
+               'bigram_file': args.bigram_file, 'quadgrams': args.quadgrams}
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+    files = list_files(args.inputs)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    for record in crack_batch(files, args.method, options, args.workers or None):
+        out.write(json.dumps(record) + '\n')
+    if out is not sys.stdout:
+        out.close()
@@ -0,0 +1,197 @@
+import argparse
+import glob
+import json
+import random
+import sys
+import time
+import tracemalloc
+from cipher import CaesarCipher, read_message
+from hill_climb import HillClimbing, solve_quad
+from strategies import HillClimb
+from inputs import parse_size
+
+# Size of the block of generated words which larger corpora are tiled from
+BLOCK_SIZE = 1 << 20
+
+# Slowdowns smaller than this many seconds are timing noise, never regressions
+NOISE_SECONDS = 1e-3
+
+CASES = ('encode_caesar', 'crack_caesar_frequency', 'crack_caesar_bigram', 'crack_many', 'quadgram_score',
+         'crack_caesar_quad')
+
+# Length of the messages the corpus is cut into by the crack_many case
+MESSAGE_SIZE = 100
+
+def make_corpus(size, seed, seed_files = 'messages/*.txt'):
+    '''
+    This function generates a reproducible plaintext of random words drawn from the seed messages.
+    Up to BLOCK_SIZE characters are generated word by word, larger corpora being tiled from random
+    slices of that block.
+    Args:
+        size (int): The number of characters
+        seed (int): The seed of the generator
+        seed_files (str): Glob pattern of the seed messages
+    Return:
+        The plaintext, over the alphabet of CaesarCipher
+    '''
+    rng = random.Random(seed)
+    words = ' '.join(read_message(f) for f in sorted(glob.glob(seed_files))).split()
+    pieces = []
+    length = 0
+    while length < min(size, BLOCK_SIZE):
+        word = rng.choice(words)
+        pieces.append(word)
+        length += len(word) + 1
+    block = ' '.join(pieces)[:BLOCK_SIZE]
+    if size <= len(block):
+        return block[:size]
+
+    slices = []
+    length = 0
+    while length < size:
+        start = rng.randrange(len(block) // 2)
+        slices.append(block[start:start + min(size - length, len(block) - start)])
+        length += len(slices[-1])
+    return ''.join(slices)
+
+def measure(function, repeat):
+    '''
+    This function times a benchmark case and measures its peak memory.
+    Args:
+        function (function): The case, returning the number of score evaluations it made (or None)
+        repeat (int): The number of timed runs, the fastest one being kept
+    Return:
+        The best time in seconds, the number of evaluations and the peak of traced memory in bytes
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        evaluations = function()
+        best = min(best, time.perf_counter() - start)
+
+    # memory is traced in a separate run so that tracing does not slow the timed ones
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, evaluations, peak
+
+def run_benchmarks(sizes, cases = CASES, seed = 0, repeat = 3, quad_max_size = 100000, quad_restarts = 2):
+    '''
+    This function runs every benchmark case on a seeded corpus of every size.
+    Args:
+        sizes (list): The corpus sizes in characters
+        cases (tuple): The names of the cases to be run
+        seed (int): default 0, the seed of the corpora, shifts and restarts
+        repeat (int): default 3, the number of timed runs per case
+        quad_max_size (int): default 100000, the largest corpus crack_caesar_quad is run on
+        quad_restarts (int): default 2, the number of hill-climb restarts of crack_caesar_quad
+    Return:
+        A list of dicts: case, size, seconds, chars_per_sec, evals_per_sec (None if not relevant) and peak_bytes
+    '''
+    cipher_obj = CaesarCipher()
+    scorer = HillClimbing('frequencies/english_quadgrams.txt')
+    results = []
+    for size in sizes:
+        plain = make_corpus(size, seed)
+        n = random.Random(seed).randint(1, 26)
+        cipher_text = cipher_obj.encode_caesar(plain, n)
+        letters = cipher_text.replace(' ', '').upper()
+        messages = [cipher_text[i:i + MESSAGE_SIZE] for i in range(0, len(cipher_text), MESSAGE_SIZE)]
+
+        def encode():
+            cipher_obj.encode_caesar(plain, n)
+
+        def crack_frequency():
+            cipher_obj.crack_caesar_frequency(cipher_text)
+
+        def crack_bigram():
+            cipher_obj.crack_caesar_bigram(cipher_text)
+
+        def crack_many():
+            cipher_obj.crack_many(messages)
+
+        def quadgram_score():
+            scorer.score(letters)
+            return 1
+
+        def crack_quad():
+            return solve_quad(letters, scorer=scorer, seed=seed, restarts=quad_restarts,
+                              strategy=HillClimb()).evaluations
+
+        functions = {'encode_caesar': encode, 'crack_caesar_frequency': crack_frequency,
+                     'crack_caesar_bigram': crack_bigram, 'crack_many': crack_many, 'quadgram_score': quadgram_score,
+                     'crack_caesar_quad': crack_quad}
+        for case in cases:
+            if case == 'crack_caesar_quad' and size > quad_max_size:
+                continue
+            seconds, evaluations, peak = measure(functions[case], repeat)
+            results.append({
+                'case': case,
+                'size': size,
+                'seconds': seconds,
+                'chars_per_sec': size / seconds if seconds else None,
+                'evals_per_sec': evaluations / seconds if evaluations and seconds else None,
+                'peak_bytes': peak,
+            })
+    return results
+
+def compare(results, baseline, tolerance):
+    '''
+    This function compares benchmark results against a baseline.
+    Args:
+        results (list): The results of run_benchmarks
+        baseline (list): The results of an earlier run
+        tolerance (float): The allowed relative increase of time and peak memory
+    Return:
+        The list of regression messages, empty if none
+    '''
+    previous = {(r['case'], r['size']): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = previous.get((r['case'], r['size']))
+        if old is None:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if metric == 'seconds' and r[metric] - old[metric] < NOISE_SECONDS:
+                continue
+            if old[metric] and r[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{r['case']} on {r['size']} chars: {metric} {old[metric]:.4g} -> {r[metric]:.4g}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the encoding, cracking and scoring methods on seeded synthetic corpora")
+    parser.add_argument('--sizes', nargs='+', default=['100', '10k', '1M'], help="Corpus sizes, from 100 to 100M characters")
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES), help="Methods to benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the corpora")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case, the fastest one being kept")
+    parser.add_argument('--quad-max-size', type=parse_size, default=100000, help="Largest corpus crack_caesar_quad is run on")
+    parser.add_argument('-o', '--output', type=str, help="JSON file for the results")
+    parser.add_argument('--baseline', type=str, help="JSON results of an earlier run to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results to the --baseline file instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown or memory growth")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes]
+    results = run_benchmarks(sizes, tuple(args.cases), args.seed, args.repeat, args.quad_max_size)
+
+    print(f"{'case':<24}{'size':>12}{'seconds':>12}{'chars/sec':>14}{'evals/sec':>12}{'peak MB':>10}")
+    for r in results:
+        evals = f"{r['evals_per_sec']:.0f}" if r['evals_per_sec'] else '-'
+        print(f"{r['case']:<24}{r['size']:>12}{r['seconds']:>12.5f}{r['chars_per_sec']:>14.0f}{evals:>12}"
+              f"{r['peak_bytes'] / 1e6:>10.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print('REGRESSION:', message, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
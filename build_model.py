@@ -0,0 +1,291 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import re
+import string
+import numpy as np
+from alphabet import ALPHABETS, Alphabet
+from inputs import list_files, parse_size
+
+# Name of the table of every order, and whether it is written as a CSV (CaesarCipher) or as 'NGRAM count' lines (HillClimbing)
+ORDERS = {1: ('letters', 'csv'), 2: ('bigrams', 'csv'), 3: ('trigrams', 'ngrams'), 4: ('quadgrams', 'ngrams'),
+          5: ('quintgrams', 'ngrams')}
+
+WHITESPACE = re.compile(r'\s+')
+
+def normalise(text, alphabet):
+    '''
+    This function reduces a piece of corpus to the symbols of an alphabet: the case of the alphabet (unless
+    it has both), runs of white space made one space (if the alphabet has it) and every other symbol removed,
+    so that words join up.
+    Args:
+        text (str): The text
+        alphabet (Alphabet): The alphabet, with the 'strip' policy
+    Return:
+        The normalised text
+    '''
+    text = alphabet.fold_case(text)
+    if ' ' in alphabet.index:
+        text = WHITESPACE.sub(' ', text)
+    return alphabet.normalise(text)
+
+def ngram_indices(codes, n, size):
+    '''
+    This function numbers every n-gram of a text in base 'size'.
+    Args:
+        codes (np.ndarray): The alphabet indices of the text
+        n (int): The order
+        size (int): The size of the alphabet
+    Return:
+        The int64 number of every n-gram, in text order
+    '''
+    count = len(codes) - n + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.zeros(count, dtype=np.int64)
+    for k in range(n):
+        idx = idx * size + codes[k:k + count]
+    return idx
+
+def count_chunk(task):
+    '''
+    This function counts the n-grams lying wholly inside one chunk of the corpus, in a worker process.
+    Args:
+        task (tuple): The text of the chunk and the (order, symbols) of every model
+    Return:
+        For every model: the sorted n-gram numbers, their counts, and the first and last n - 1 symbols of
+        the normalised chunk (from which the parent counts the n-grams straddling two chunks)
+    '''
+    text, models = task
+    results = []
+    normalised = {}
+    for n, symbols in models:
+        alphabet = Alphabet(symbols, 'strip')
+        if symbols not in normalised:
+            normalised[symbols] = normalise(text, alphabet)
+        chunk = normalised[symbols]
+        keys, counts = np.unique(ngram_indices(alphabet.indices(chunk), n, len(symbols)), return_counts=True)
+        results.append((keys, counts, chunk[:n - 1], chunk[len(chunk) - n + 1:] if n > 1 else ''))
+    return results
+
+class NgramCounter:
+
+    def __init__(self, symbols, n, max_entries = 2_000_000):
+        '''
+        This is the initialising constructor.
+        self.keys, self.counts (np.ndarray): The merged n-gram numbers and counts, sorted by number.
+        self.pending (list): Counts of chunks not merged yet.
+        self.total (int): The number of n-grams counted, pruned ones included.
+        self.pruned (int): The number of counts dropped by pruning.
+        Args:
+            symbols (str): The alphabet
+            n (int): The order, from 1 to 5
+            max_entries (int): default 2,000,000, the number of distinct n-grams kept, the rarest ones being
+                pruned beyond it so that memory stays bounded
+        '''
+        self.symbols = symbols
+        self.alphabet = Alphabet(symbols)
+        self.n = n
+        self.max_entries = max_entries
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.pending = []
+        self.pending_size = 0
+        self.total = 0
+        self.pruned = 0
+
+    def add(self, keys, counts):
+        '''
+        This function adds the counts of a chunk, merging once enough are pending.
+        Args:
+            keys (np.ndarray): The n-gram numbers
+            counts (np.ndarray): Their counts
+        '''
+        self.pending.append((keys, counts))
+        self.pending_size += len(keys)
+        self.total += int(counts.sum())
+        if self.pending_size > self.max_entries:
+            self.merge()
+
+    def add_text(self, text):
+        '''
+        This function counts the n-grams of an already normalised text.
+        Args:
+            text (str): The text
+        '''
+        idx = ngram_indices(self.alphabet.indices(text), self.n, len(self.symbols))
+        if len(idx):
+            self.add(*np.unique(idx, return_counts=True))
+
+    def merge(self):
+        '''
+        This function merges the pending counts, then prunes the rarest n-grams beyond max_entries.
+        '''
+        if not self.pending:
+            return
+        keys = np.concatenate([self.keys] + [k for k, _ in self.pending])
+        counts = np.concatenate([self.counts] + [c for _, c in self.pending])
+        self.pending = []
+        self.pending_size = 0
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        if len(self.keys) > self.max_entries:
+            keep = np.sort(np.argpartition(self.counts, -self.max_entries)[-self.max_entries:])
+            self.pruned += int(self.counts.sum() - self.counts[keep].sum())
+            self.keys, self.counts = self.keys[keep], self.counts[keep]
+
+    def table(self):
+        '''
+        This function lists the n-grams counted.
+        Return:
+            A list of (n-gram, count), most frequent first
+        '''
+        self.merge()
+        size = len(self.symbols)
+        rows = []
+        for key, count in zip(self.keys.tolist(), self.counts.tolist()):
+            letters = []
+            for _ in range(self.n):
+                key, code = divmod(key, size)
+                letters.append(self.symbols[code])
+            rows.append((''.join(reversed(letters)), count))
+        rows.sort(key=lambda row: (-row[1], row[0]))
+        return rows
+
+def iter_chunks(files, chunk_size):
+    '''
+    This function reads the corpus in chunks of characters.
+    Args:
+        files (list): The corpus files
+        chunk_size (int): The number of characters per chunk
+    Return:
+        A generator of (file number, text of the chunk)
+    '''
+    for number, file_name in enumerate(files):
+        with open(file_name, errors='replace') as f:
+            rest = ''
+            for chunk in iter(lambda: f.read(chunk_size), ''):
+                # trailing white space moves to the next chunk, so that a run of it is never split in two
+                chunk = rest + chunk
+                text = chunk.rstrip()
+                rest = chunk[len(text):]
+                if text:
+                    yield number, text
+            if rest:
+                yield number, rest
+
+def count_corpus(files, models, workers = None, chunk_size = 1 << 22, max_entries = 2_000_000):
+    '''
+    This function counts the n-grams of a corpus over a pool of worker processes, streaming it chunk by
+    chunk so that only a few chunks are held at once, every model being counted in the same pass.
+    The n-grams straddling two chunks of a file are counted from the edges of the chunks, so the counts
+    are those of the whole files.
+    Args:
+        files (list): The corpus files
+        models (list): The (order, symbols) of every model, the order being from 1 to 5
+        workers (int): The number of processes, None for one per core
+        chunk_size (int): default 4M, the number of characters per chunk
+        max_entries (int): default 2,000,000, the number of distinct n-grams kept per model (see NgramCounter)
+    Return:
+        The NgramCounter of every model
+    '''
+    counters = [NgramCounter(symbols, n, max_entries) for n, symbols in models]
+    workers = workers or os.cpu_count()
+    tasks = ((number, (text, models)) for number, text in iter_chunks(files, chunk_size))
+
+    def results(executor):
+        # chunks are counted in order, a couple of them ahead per worker
+        pending = deque()
+        for number, task in tasks:
+            pending.append((number, executor.submit(count_chunk, task)))
+            if len(pending) > 2 * workers:
+                number, future = pending.popleft()
+                yield number, future.result()
+        for number, future in pending:
+            yield number, future.result()
+
+    carries = [''] * len(models)
+    current = None
+    with ProcessPoolExecutor(workers) as executor:
+        for number, chunk_results in results(executor):
+            if number != current:
+                current, carries = number, [''] * len(models)
+            for k, (counter, (keys, counts, head, tail)) in enumerate(zip(counters, chunk_results)):
+                counter.add(keys, counts)
+                n = counter.n
+                if n == 1:
+                    continue
+                # carry and head are both shorter than n, so every n-gram of carry + head straddles the edge
+                counter.add_text(carries[k] + head)
+                carries[k] = (carries[k] + head)[-(n - 1):] if len(head) < n - 1 else tail
+    for counter in counters:
+        counter.merge()
+    return counters
+
+def write_csv(counter, file_name, scale = 1000.0):
+    '''
+    This function writes a table of order 1 or 2 as the 'key,frequency' CSV read by CaesarCipher:
+    single symbols in upper case, letters first (as plain_alphabet expects), bigrams in lower case.
+    The CSV loader ignores case, so the counts of keys differing only by case are added together.
+    Args:
+        counter (NgramCounter): The counts
+        file_name (str): The CSV file
+        scale (float): default 1000, the frequencies are per 'scale' n-grams
+    '''
+    folded = {}
+    for key, count in counter.table():
+        folded[key.lower()] = folded.get(key.lower(), 0) + count
+    if counter.n == 1:
+        for ch in counter.symbols:
+            folded.setdefault(ch.lower(), 0)
+    rows = sorted(folded.items(), key=lambda row: (-row[1], row[0]))
+    if counter.n == 1:
+        rows.sort(key=lambda row: not row[0].isalpha())
+        rows = [(key.upper(), count) for key, count in rows]
+    total = max(counter.total, 1)
+    with open(file_name, 'w') as f:
+        f.write('\n'.join(f"{key},{count * scale / total:.6f}" for key, count in rows))
+
+def write_ngrams(counter, file_name):
+    '''
+    This function writes a table as the 'NGRAM count' lines read by HillClimbing.
+    Args:
+        counter (NgramCounter): The counts
+        file_name (str): The n-gram file
+    '''
+    with open(file_name, 'w') as f:
+        for key, count in counter.table():
+            f.write(f"{key.upper()} {count}\n")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build letter, bigram and n-gram tables from a corpus")
+    parser.add_argument('inputs', nargs='+', help="Directories or glob patterns of the corpus files")
+    parser.add_argument('-n', '--orders', type=int, nargs='+', choices=sorted(ORDERS), default=[1, 2, 4],
+                        help="Orders of the tables: 1 and 2 as CSV for cipher.py, 3 to 5 as n-gram counts for hill_climb.py")
+    parser.add_argument('-o', '--output', type=str, default='.', help="Directory of the tables")
+    parser.add_argument('--prefix', type=str, default='model', help="Prefix of the table files")
+    parser.add_argument('--alphabet', choices=sorted(ALPHABETS), default='english',
+                        help="Symbols of the order 1 and 2 tables (higher orders are always a-z)")
+    parser.add_argument('-j', '--workers', type=int, default=0, help="Number of worker processes (0 for one per core)")
+    parser.add_argument('--chunk-size', type=parse_size, default=1 << 22, help="Characters read per chunk")
+    parser.add_argument('--max-entries', type=parse_size, default=2_000_000,
+                        help="Distinct n-grams kept per table, the rarest being pruned beyond it")
+    parser.add_argument('--scale', type=float, default=1000.0, help="The CSV frequencies are per this many n-grams")
+    args = parser.parse_args()
+
+    files = list_files(args.inputs)
+    models = [(n, ALPHABETS[args.alphabet] if ORDERS[n][1] == 'csv' else string.ascii_lowercase)
+              for n in sorted(set(args.orders))]
+    counters = count_corpus(files, models, args.workers or None, args.chunk_size, args.max_entries)
+    os.makedirs(args.output, exist_ok=True)
+    for (n, _), counter in zip(models, counters):
+        name, kind = ORDERS[n]
+        if kind == 'csv':
+            file_name = os.path.join(args.output, f"{args.prefix}_{name}.csv")
+            write_csv(counter, file_name, args.scale)
+        else:
+            file_name = os.path.join(args.output, f"{args.prefix}_{name}.txt")
+            write_ngrams(counter, file_name)
+        pruned = f", {counter.pruned} pruned" if counter.pruned else ''
+        print(f"{file_name}: {counter.total} {name}, {len(counter.keys)} distinct{pruned}")
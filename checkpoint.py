@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+# Layout of the checkpoint files, a file of another version is refused
+CHECKPOINT_VERSION = 2
+
+def cipher_digest(cipher):
+    '''
+    This function names a ciphertext in its checkpoints, so that a run is never resumed on another text.
+    Args:
+        cipher (str): The ciphertext
+    Return:
+        A hex digest of the ciphertext
+    '''
+    return hashlib.blake2b(cipher.encode(), digest_size=16).hexdigest()
+
+def save_checkpoint(file_name, state):
+    '''
+    This function writes a checkpoint atomically: the state is written to a temporary file which then
+    replaces the checkpoint, so an interrupted write leaves the previous checkpoint intact.
+    Args:
+        file_name (str): The checkpoint file
+        state (dict): The state of the run, which can be dumped as JSON
+    '''
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name, 'w') as f:
+        json.dump(dict(state, version=CHECKPOINT_VERSION), f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, file_name)
+
+def trace_file(file_name):
+    '''
+    This function names the file where the trace of a checkpointed run is kept, next to the checkpoint.
+    Args:
+        file_name (str): The checkpoint file
+    Return:
+        The trace file
+    '''
+    return file_name + '.trace'
+
+def append_trace(file_name, entries, truncate = False):
+    '''
+    This function appends entries to the trace of a checkpointed run, one JSON array per line, so that a
+    save writes the restarts done since the previous one only.
+    Args:
+        file_name (str): The checkpoint file
+        entries (list): The new entries of the trace
+        truncate (bool): start the trace afresh
+    '''
+    with open(trace_file(file_name), 'w' if truncate else 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def load_trace(file_name, count):
+    '''
+    This function reads the trace of a checkpointed run. The trace is written before the checkpoint, so it
+    may hold entries the checkpoint does not count yet: they are dropped, from the file too, and their
+    restarts run again.
+    Args:
+        file_name (str): The checkpoint file
+        count (int): The number of restarts counted by the checkpoint
+    Return:
+        The list of the entries, as tuples
+    Raises:
+        ValueError: if the trace holds fewer entries than the checkpoint counts
+    '''
+    entries = []
+    with open(trace_file(file_name), 'rb+') as f:
+        while len(entries) < count:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                raise ValueError(f"Trace of {file_name} holds {len(entries)} restarts, expected {count}")
+            entries.append(tuple(json.loads(line)))
+        f.truncate(f.tell())
+    return entries
+
+def load_checkpoint(file_name, cipher):
+    '''
+    This function reads the checkpoint of a run.
+    Args:
+        file_name (str): The checkpoint file
+        cipher (str): The ciphertext of the run being resumed
+    Return:
+        The state of the run as a dict, None if there is no checkpoint yet
+    Raises:
+        ValueError: if the checkpoint is of another version or of another ciphertext
+    '''
+    if not os.path.exists(file_name):
+        return None
+    with open(file_name) as f:
+        state = json.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {file_name} has version {state.get('version')}, expected {CHECKPOINT_VERSION}")
+    if state.get('cipher') != cipher_digest(cipher):
+        raise ValueError(f"Checkpoint {file_name} belongs to another ciphertext")
+    return state
@@ -1,7 +1,35 @@
-from collections import Counter
+from collections import namedtuple
 import argparse
-import matplotlib.pyplot as plt
-import networkx as nx
+import json
+import mmap
+import os
+from math import erf, sqrt
+import numpy as np
+from tables import load_table
+from instrument import NULL_STATS, Stats, profiled
+from wordlist import WordValidator
+from hill_climb import HillClimbing
+from alphabet import ALPHABETS, POLICIES, get_alphabet
+
+# Size of the slices used when a writable buffer is shifted in place or a file is streamed
+CHUNK_SIZE = 1 << 20
+
+# Scores which rank_candidates can combine
+RANKING_SCORES = ('letter', 'bigram', 'quad', 'dictionary')
+
+# Cells of the matrix of decoded texts built and scored at once by rank_candidates (as many rotations as fit,
+# at least one), which bounds the memory of the quadgram ranking to a few dozen bytes per cell
+QUAD_BLOCK = 1 << 20
+
+# Weight of a capital letter against its lower case letter, in an alphabet holding both, as the frequency tables
+# are case-folded: of two rotations decoding the same letters in different cases (n and n + 26 in 'alphanumeric'),
+# the one giving mostly lower case letters wins, as in prose; a text in capitals only is read in lower case
+CAPITAL_WEIGHT = 0.9
+
+Candidate = namedtuple('Candidate', 'shift score scores plaintext')
+
+# Normalisation of a message: '.' and ',' are removed and line breaks become spaces
+NORMALISE_TABLE = str.maketrans({'.': None, ',': None, '\n': ' '})
 
 def char_replace_lower(line, to_be_replaced, to_be_replaced_with = ''):
     '''
@@ -16,22 +44,34 @@ def char_replace_lower(line, to_be_replaced, to_be_replaced_with = ''):
     '''
     return line.replace(to_be_replaced, to_be_replaced_with).lower()
 
-def read_message(file_name):
+def iter_message(file_name, chunk_size = CHUNK_SIZE, alphabet = None):
+    '''
+    This function will stream the message of a given text file in fixed-size chunks, each
+    pre-processed like read_message, so that a message of any size is read in constant memory.
+    Args:
+        file_name (str): The file from which the message is to be read
+        chunk_size (int): The number of characters read at a time
+        alphabet (Alphabet): The alphabet whose case the message is brought to (see Alphabet.fold_case),
+            lower case by default
+    Return:
+        A generator of the pre-processed chunks
+    '''
+    with open(file_name, 'r') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            chunk = chunk.translate(NORMALISE_TABLE)
+            yield alphabet.fold_case(chunk) if alphabet is not None else chunk.lower()
+
+def read_message(file_name, alphabet = None):
     '''
     This function will read the message from a given text file.
     Assumption: No other special characters apart from '.' and ',' which will be replaced.
     Args:
         file_name (str): The file from which the message is to be read
+        alphabet (Alphabet): The alphabet whose case the message is brought to, lower case by default
     Return:
         The message read from the txt file and pre-processed
     '''
-    message = ''
-    f = open(file_name, 'r')
-    for line in f:
-        line = char_replace_lower(line, '.')
-        line = char_replace_lower(line, ',')
-        message += char_replace_lower(line, '\n', ' ')
-    return message
+    return ''.join(iter_message(file_name, alphabet=alphabet))
 
 def print_stdout(text):
     '''
@@ -42,106 +82,99 @@ def print_stdout(text):
     line = 25 * "-"
     print(line + text + line)
 
-def create_labels(score_list, edge):
-    '''
-    This function creates the labels for the networkx graph edges.
-    Args:
-        score_list (list): List of the scores obtained via letter frequency/bigram frequency
-        edge (list[list]): A list containing pair list of each edge
-    Return:
-        labels which is a dict{tuple: value}
-    '''
-    labels = {}
-    count = 0
-    for i in edge:
-        test = (i[0], i[1])
-        labels[test] = score_list[count]
-        count = count + 1
-    #print(labels)
-    return labels
-
-def create_graph(selected, root, score_list, file_name):
-    '''
-    This function creates a graph.
-    Args:
-        selected (int): The 'n' caesar rotation value chosen
-        root (str): The root of the graph
-        score_list (list): List of the scores obtained via letter frequency/bigram frequency
-        file_name (str): The file name for saving the graph
-    '''
-    edge = []
-    
-    for i in range(0,27):
-        edge.append([root, i])
-
-    G = nx.Graph()
-    G.add_edges_from(edge)
-    pos = nx.spring_layout(G, scale=5)
-    plt.figure()
-
-    color_map = ['green' if node == selected else 'pink' for node in G]     
-    #graph = nx.draw_networkx(G,pos, node_color=color_map) 
-
-    nx.draw(G, pos, edge_color='black', width=1, linewidths=1,
-    node_size=400, node_color=color_map, alpha=0.9,
-    labels={node: node for node in G.nodes()})
-
-    nx.draw_networkx_edge_labels(G, pos, 
-    edge_labels = create_labels(score_list, edge), font_color='red')
-    #plt.axis('off')
-    plt.savefig("states/" + file_name + ".png")
-
-def create_straight_graph(selected, root, file_name, labels):
-    '''
-    This function creates a straight graph with no edge labels
-    Args:
-        selected (int): The 'n' caesar rotation value chosen
-        root (str): The root of the graph
-        file_name (str): The file name for saving the graph
-        labels (list): A list of labels for each edge
-    '''
-
-    edge = [[root, 1]]
-    for i in range(1,26):
-        edge.append([i, i+1])
-    #print(edge)
-    G = nx.Graph()
-    G.add_edges_from(edge)
-    pos = nx.spring_layout(G, scale=5)
-    plt.figure()
-
-    color_map = ['green' if node == selected else 'pink' for node in G]   
-    #graph = nx.draw_networkx(G,pos, node_color=color_map) # node lables
-
-    nx.draw(
-        G, pos, edge_color='black', width=1, linewidths=1,
-        node_size=400, node_color=color_map, alpha=0.9,
-        labels={node: node for node in G.nodes()}
-    )
-    nx.draw_networkx_edge_labels(G, pos, 
-    edge_labels = create_labels(labels, edge), font_color='red', font_size=8,
-    rotate=False)
-
-    plt.savefig("states/" + file_name + ".png")
-
 class CaesarCipher:
 
-    def __init__(self):
+    # Largest alphabet for which the bigram rotations (size^3 floats) are built
+    MAX_BIGRAM_SYMBOLS = 128
+
+    def __init__(self, stats = None, alphabet = None, frequency_file = 'frequencies/letter_frequencies.csv',
+                 bigram_file = 'frequencies/bigram_frequency.csv'):
         '''
         This is the initialising constructor.
+        self.alphabet (Alphabet): The symbols which are shifted, and what is done with the others (see alphabet.py).
         self.alpha_dict (dictionary): A dictionary of all the alphabets mappet to corresponding indices. Space is given an index too.
         self.alpha_dict_complement (dictionary): Index to alphabet mapping dictionary.
+        self.shift_tables (list): str.translate tables, one for every rotation factor.
+        self.byte_shift_tables (list): bytes.translate tables, one for every rotation factor.
         self.freq_dict (dictionary): An empty dictionary initialised to store the computed frequency distribution of english alphabets.
+        self.freq_rotations (np.ndarray): 27x27 matrix whose row 'n' holds the letter frequencies rotated by 'n'.
+        self.index_table (bytes): bytes.translate table mapping each symbol to its index (255 if unknown).
+        self.bigram_rotations (np.ndarray): 27x729 matrix whose row 'n' holds the flattened 27x27 bigram table rotated by 'n' on both axes.
+        The sizes above are those of the default alphabet (a-z and space); every table is built for the alphabet given.
         self.frequency_csv_read (function): To read the alphabet frequency CSV file.
+        self.stats (Stats): Where the table loading and cracking phases are timed, nothing is recorded by default.
+        Args:
+            stats (Stats): optional instrumentation
+            alphabet (Alphabet): default a-z and space, leaving other symbols untouched
+            frequency_file (str): 'symbol,frequency' CSV of the language of the messages
+            bigram_file (str): 'bigram,frequency' CSV of the language of the messages
         '''
-        self.alpha_dict = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5, 'g': 6, 'h': 7,
-        'i': 8, 'j': 9, 'k': 10, 'l': 11, 'm': 12, 'n': 13, 'o': 14,'p': 15, 'q': 16, 'r': 17, 
-        's': 18, 't': 19, 'u': 20,'v': 21, 'w': 22, 'x': 23, 'y': 24, 'z': 25, ' ': 26}
+        self.stats = stats or NULL_STATS
+        self.alphabet = alphabet or get_alphabet('english')
+        self.alpha_dict = dict(self.alphabet.index)
         self.alpha_dict_complement = {v: k for k, v in self.alpha_dict.items()}
+        self.shift_tables = []
+        self.byte_shift_tables = []
+        self.index_table = None
+        self.build_shift_tables()
         self.freq_dict = {}
+        self.freq_rotations = None
         self.bigram_dict = {}
-        self.frequency_csv_read()
-        self.bigram_csv_read()
+        self.bigram_rotations = None
+        self.frequency_file = frequency_file
+        self.bigram_file = bigram_file
+        with self.stats.phase('table_load'):
+            self.frequency_csv_read()
+            self.bigram_csv_read()
+
+    def build_shift_tables(self):
+        '''
+        This function takes the translation tables for all the rotation factors from the alphabet, where
+        they are precomputed so that a whole message can be shifted in one bulk pass instead of one
+        character at a time.
+        '''
+        self.shift_tables = self.alphabet.shift_tables
+        self.byte_shift_tables = self.alphabet.byte_shift_tables
+        self.index_table = self.alphabet.index_table
+
+    def text_indices(self, text):
+        '''
+        This function converts a text into an array of alphabet indices.
+        Args:
+            text (str or bytes): The text to be converted
+        Return:
+            An integer array holding the index of every character (at least the alphabet size, 255 for
+            ASCII alphabets, for characters outside the alphabet)
+        '''
+        return self.alphabet.indices(text)
+
+    def shift_text(self, text, n):
+        '''
+        This function shifts every character of a text by 'n' using the precomputed tables.
+        Characters outside the alphabet are handled by the policy of the alphabet: left untouched,
+        removed or rejected with a ValueError.
+        Args:
+            text (str, bytes, bytearray or memoryview): The text to be shifted
+            n (int): The rotation factor (negative to shift backwards)
+        Return:
+            A new str/bytes for immutable inputs. A bytearray/memoryview is rewritten in place
+            (chunk by chunk, so large buffers are never copied whole) and returned.
+        '''
+        if isinstance(text, (str, bytes)):
+            return self.alphabet.shift(text, n)
+
+        view = memoryview(text).cast('B')
+        if view.readonly:
+            raise TypeError('cannot shift a read-only buffer in place')
+        if not self.alphabet.ascii:
+            raise TypeError('buffers can only be shifted with an ASCII alphabet')
+        if self.alphabet.policy == 'strip':
+            raise ValueError('cannot strip symbols from a buffer in place')
+        table = self.byte_shift_tables[n % len(self.alpha_dict)]
+        for start in range(0, len(view), CHUNK_SIZE):
+            chunk = view[start:start + CHUNK_SIZE]
+            chunk[:] = self.alphabet.normalise(chunk.tobytes()).translate(table)
+        return text
 
     def monoalpha_shift(self, letter, n):
         '''
@@ -152,56 +185,64 @@ class CaesarCipher:
             n (int): The rotation factor
         Return:
             A letter after rotating by a factor of n.
-        Mod 27 is taken because 26 alphabets  + space
+        Mod 27 is taken because 26 alphabets  + space (the size of the alphabet in general).
+        A letter outside the alphabet is handled by its policy.
         '''
-        position = self.alpha_dict[letter] 
-        return self.alpha_dict_complement[(position + n) % 27]  
+        if letter not in self.alpha_dict:
+            return self.alphabet.normalise(letter)
+        position = self.alpha_dict[letter]
+        return self.alpha_dict_complement[(position + n) % len(self.alpha_dict)]
 
     def encode_caesar(self, message, n):
         '''
         This function encodes a message by monoalphabetic shift of each character of it.
         Args:
-            message (str): The message to be encoded
+            message (str, bytes, bytearray or memoryview): The message to be encoded
             n (int): The rotation factor
         Return:
-            The cipher text
+            The cipher text (mutable buffers are encoded in place)
         '''
-        cipher = ""
-
-        for m in message:
-            c = self.monoalpha_shift(m, n)
-            cipher += c
-        return cipher
+        return self.shift_text(message, n)
 
     def decode_caesar(self, cipher_text, n):
         '''
         This function decodes a message by monoalphabetic shift of each character of it.
         Args:
-            cipher_text (str): The cipher text to be decoded
+            cipher_text (str, bytes, bytearray or memoryview): The cipher text to be decoded
             n (int): The rotation factor
         Return:
-            The plain text
+            The plain text (mutable buffers are decoded in place)
         '''
-        plain_text = ""
-        for c in cipher_text:
-            p = self.monoalpha_shift(c, n * -1)
-            plain_text += p
-        return plain_text
+        return self.shift_text(cipher_text, n * -1)
+
+    def case_weight(self, symbols):
+        '''
+        This function gives the weight of a symbol (or bigram) against its lower case form in the case-folded
+        frequency tables.
+        Args:
+            symbols (str): The symbol or bigram
+        Return:
+            CAPITAL_WEIGHT for every capital letter whose lower case letter is in the alphabet too
+        '''
+        weight = 1.0
+        for ch in symbols:
+            if ch != ch.lower() and ch.lower() in self.alpha_dict:
+                weight *= CAPITAL_WEIGHT
+        return weight
 
     def frequency_csv_read(self):
         '''
         This function reads the CSV file to get the frequency of each alphabet.
+        The file is read through its compiled form in the table cache (see tables.py).
         '''
-        file = 'frequencies/letter_frequencies.csv'
-        f = open(file, "r+")
-
-        for line in f:
-            line = line.lower().replace("\n", "")
-            k, v = line.split(",")
-            self.freq_dict[k] = float(v)
-
-        f.close()
+        for k, v in load_table(self.frequency_file, 'csv').tolist():
+            self.freq_dict[k] = v
         #print(self.freq_dict)
+        # symbols missing from the table (digits, punctuation...) weigh nothing, upper case letters weigh as lower
+        # case, a little less if the alphabet has both
+        freq = np.array([self.freq_dict.get(ch.lower(), 0.0) * self.case_weight(ch) for ch in self.alpha_dict.keys()])
+        # row n, column c holds the frequency of the letter that c decodes to under shift n
+        self.freq_rotations = np.array([np.roll(freq, n) for n in range(len(freq))])
 
     def score_string(self, string):
         '''
@@ -213,41 +254,135 @@ class CaesarCipher:
         '''
         score = 0.0
         for ch in string:
-            score += self.freq_dict[ch]
+            score += self.freq_dict.get(ch.lower(), 0.0) * self.case_weight(ch)
 
         return score
 
+    def symbol_histogram(self, text):
+        '''
+        This function counts how many times each symbol of the alphabet occurs in the text.
+        Characters outside the alphabet are ignored.
+        Args:
+            text (str or bytes): The text to be counted
+        Return:
+            An array of 27 counts indexed like self.alpha_dict
+        '''
+        if not self.alphabet.ascii:
+            idx = self.text_indices(text)
+            return np.bincount(idx[idx < len(self.alpha_dict)], minlength=len(self.alpha_dict))
+        if isinstance(text, str):
+            text = text.encode()
+        counts = np.bincount(np.frombuffer(text, dtype=np.uint8), minlength=256)
+        return counts[[ord(ch) for ch in self.alpha_dict.keys()]]
+
+    def file_histogram(self, file_name):
+        '''
+        This function counts the symbols of a text file through a memory map, in chunks, so that
+        the file is never loaded whole. The counts are those of the message read by read_message with the
+        alphabet: letters count in its case (unless it has both) and line breaks as spaces.
+        Args:
+            file_name (str): The file to be counted
+        Return:
+            An array of 27 counts indexed like self.alpha_dict
+        '''
+        if not self.alphabet.ascii:
+            return self.stream_histogram(iter_message(file_name, alphabet=self.alphabet))
+        counts = np.zeros(256, dtype=np.int64)
+        with open(file_name, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start in range(0, len(mm), CHUNK_SIZE):
+                        counts += np.bincount(np.frombuffer(mm[start:start + CHUNK_SIZE], dtype=np.uint8),
+                                              minlength=256)
+
+        hist = np.array([counts[ord(ch)] + (counts[ord(ch.swapcase())] if ch.swapcase() not in self.alpha_dict else 0)
+                         for ch in self.alpha_dict.keys()])
+        if ' ' in self.alpha_dict and '\n' not in self.alpha_dict:
+            hist[self.alpha_dict[' ']] += counts[ord('\n')]
+        return hist
+
+    def stream_histogram(self, chunks):
+        '''
+        This function counts the symbols of a text given chunk by chunk.
+        Args:
+            chunks (iterable): The chunks of the text, such as produced by iter_message
+        Return:
+            An array of 27 counts indexed like self.alpha_dict
+        '''
+        hist = np.zeros(len(self.alpha_dict), dtype=np.int64)
+        for chunk in chunks:
+            hist += self.symbol_histogram(chunk)
+        return hist
+
+    def encode_stream(self, chunks, n):
+        '''
+        This function encodes a message given chunk by chunk.
+        Args:
+            chunks (iterable): The chunks of the message, such as produced by iter_message
+            n (int): The rotation factor
+        Return:
+            A generator of the encoded chunks
+        '''
+        for chunk in chunks:
+            yield self.encode_caesar(chunk, n)
+
+    def decode_stream(self, chunks, n):
+        '''
+        This function decodes a cipher text given chunk by chunk.
+        Args:
+            chunks (iterable): The chunks of the cipher text
+            n (int): The rotation factor
+        Return:
+            A generator of the decoded chunks
+        '''
+        for chunk in chunks:
+            yield self.decode_caesar(chunk, n)
+
+    def crack_histogram(self, hist):
+        '''
+        This function finds the rotation factor of a cipher text from its symbol histogram alone,
+        such as returned by stream_histogram or file_histogram.
+        Args:
+            hist (np.ndarray): The 27 symbol counts of the cipher text
+        Return:
+            The 'n' rotation factor and the scores list
+        '''
+        decode_scores = (self.freq_rotations @ hist).tolist()
+        return self.best_shift(decode_scores), decode_scores
+
+    def best_shift(self, scores):
+        '''
+        This function picks the rotation factor with the maximum score.
+        Args:
+            scores (list): The score of every rotation factor
+        Return:
+            The index of the first maximum score
+        '''
+        max_score = 0
+        max_score_index = -1
+        for i in range(len(scores)):
+            if scores[i] > max_score:
+                max_score = scores[i]
+                max_score_index = i
+        return max_score_index
+
     def crack_caesar_frequency(self, cipher_text):
         '''
         This function attempts to crack the caesar cipher using the frequency distribution.
+        The cipher text is counted once and the score of every rotation is the dot product of that
+        histogram with the rotated letter frequencies, which is the same as score_string on each
+        decoded text. Only the winning rotation is decoded.
         The outcome which gives the maximum score when evaluated is accepted.
         Args:
             cipher_text (str): The cipher text
         Return:
             The cracked plain text,'n' rotation factor, scores list
         '''
-        #List to store each decode possibility
-        decode_list = []
-        #List to store the frequency score of each decode
-        decode_scores = []
-
-        for i in range(len(self.alpha_dict)):
-            plain = ""
-            for c in cipher_text:
-                p = self.monoalpha_shift(c, i * -1)
-                plain += p
-            #print(self.score_string(plain))
-            decode_list.append(plain)
-            decode_scores.append(self.score_string(plain))
-    
-        max_score = 0
-        max_score_index = -1
-        for i in range(len(self.alpha_dict)):
-            if decode_scores[i] > max_score:
-                max_score = decode_scores[i]
-                max_score_index = i
+        self.stats.count('chars', len(cipher_text))
+        with self.stats.phase('crack_frequency'):
+            max_score_index, decode_scores = self.crack_histogram(self.symbol_histogram(cipher_text))
 
-        return decode_list[max_score_index], max_score_index, decode_scores
+        return self.decode_caesar(cipher_text, max_score_index), max_score_index, decode_scores
     
     def crack_caesar_27n(self, cipher_text, i):
         '''
@@ -258,144 +393,417 @@ class CaesarCipher:
         Return:
             The shifted cipher text.
         '''
-        plain_text = ""
-
-        for c in cipher_text:
-            p = self.monoalpha_shift(c, i * -1)
-            plain_text += p
-        return plain_text
+        return self.shift_text(cipher_text, i * -1)
  
     def bigram_csv_read(self):
         '''
         This function reads the CSV file to get the bigram frequency.
+        The file is read through its compiled form in the table cache (see tables.py).
+        The table is also laid out as a dense 27x27 array (space and missing bigrams score 0).
         '''
-        file = 'frequencies/bigram_frequency.csv'
-        f = open(file, "r+")
-
-        for line in f:
-            line = line.lower().replace("\n", "")
-            k, v = line.split(",")
-            self.bigram_dict[k] = float(v)
+        for k, v in load_table(self.bigram_file, 'csv').tolist():
+            self.bigram_dict[k] = v
         #print(self.bigram_dict)
-        f.close()
+
+        size = len(self.alpha_dict)
+        if size > self.MAX_BIGRAM_SYMBOLS:
+            return
+        # upper case letters weigh as lower case (a little less if the alphabet has both), bigrams of other
+        # symbols weigh nothing
+        symbols = list(self.alpha_dict.keys())
+        table = np.array([[self.bigram_dict.get((a + b).lower(), 0.0) * self.case_weight(a + b) for b in symbols]
+                          for a in symbols])
+        self.bigram_rotations = np.array(
+            [np.roll(table, (n, n), axis=(0, 1)).ravel() for n in range(size)])
+
+    def bigram_table(self):
+        '''
+        This function returns the bigram rotations, which are not built for the largest alphabets.
+        Return:
+            self.bigram_rotations
+        '''
+        if self.bigram_rotations is None:
+            raise ValueError(f"No bigram table for an alphabet of more than {self.MAX_BIGRAM_SYMBOLS} symbols")
+        return self.bigram_rotations
+
+    def bigram_counts(self, text, weighting='presence'):
+        '''
+        This function counts the bigrams of a text into a flattened 27x27 matrix.
+        Bigrams touching a character outside the alphabet are ignored.
+        Args:
+            text (str or bytes): The text to be counted
+            weighting (str): 'presence' to mark each distinct bigram once, 'count' to keep the number of occurrences
+        Return:
+            An array of 729 weights, the bigram (a, b) being at index 27 * a + b
+        '''
+        if weighting not in ('presence', 'count'):
+            raise ValueError(f"Unknown bigram weighting: {weighting}")
+        size = len(self.alpha_dict)
+        idx = self.text_indices(text).astype(np.intp)
+        first, second = idx[:-1], idx[1:]
+        known = (first < size) & (second < size)
+        counts = np.bincount(first[known] * size + second[known], minlength=size * size)
+        if weighting == 'presence':
+            counts = counts > 0
+        return counts.astype(float)
     
-    def bigram_score(self, cipher):
+    def bigram_score(self, cipher, weighting='presence'):
         '''
         This function computes the bigram frequency distribution value of the string.
         Args:
             string (str): The message to be evaluated
+            weighting (str): 'presence' to score each distinct bigram once, 'count' to score every occurrence
         Return:
             The bigram frequency score
         '''
-        score = 0.0
-        # create a bigram frequency dictionary of the ciphertext
-        bigram_freq = Counter(cipher[idx : idx + 2] for idx in range(len(cipher) - 1))
-        sorted_bigram ={k: v for k, v in sorted(dict(bigram_freq).items(), key=lambda item: item[1])}
-        
-        for k in sorted_bigram.keys():
-            try:
-                #possible that not all bigrams in the dictionary so escape those
-                score += self.bigram_dict[k]
-            except:
-                pass
+        return float(self.bigram_table()[0] @ self.bigram_counts(cipher, weighting))
 
-        return score
-        #bigram_freq = Counter(cipher[idx : idx + 2] for idx in range(len(cipher) - 1))
-        #return {k: v for k, v in sorted(dict(bigram_freq).items(), key=lambda item: item[1])}
-
-    def crack_caesar_bigram(self, cipher_text):
+    def crack_caesar_bigram(self, cipher_text, weighting='presence'):
         '''
         This function attempts to crack the caesar cipher using the bigram frequency distribution.
+        The bigrams of the cipher text are counted once and every rotation is scored against the
+        bigram table rolled by that rotation on both axes, so no decoded copy is built per rotation.
         The outcome which gives the maximum score when evaluated is accepted.
         Args:
             cipher_text (str): The cipher text
+            weighting (str): 'presence' to score each distinct bigram once, 'count' to score every occurrence
         Return:
             The cracked plain text, 'n' rotation factor and bigram frequency score
         '''
-        #List to store each decode possibility
-        decode_list = []
-        #List to store the frequency score of each decode
-        decode_scores = []
-
-        for i in range(len(self.alpha_dict)):
-            plain = ""
-            for c in cipher_text:
-                p = self.monoalpha_shift(c, i * -1)
-                plain += p
+        self.stats.count('chars', len(cipher_text))
+        with self.stats.phase('crack_bigram'):
+            counts = self.bigram_counts(cipher_text, weighting)
+            decode_scores = (self.bigram_table() @ counts).tolist()
+        max_score_index = self.best_shift(decode_scores)
 
-            decode_list.append(plain)
-            decode_scores.append(self.bigram_score(plain))
+        return self.decode_caesar(cipher_text, max_score_index), max_score_index, decode_scores
 
-        max_score = 0
-        max_score_index = -1
-        for i in range(len(self.alpha_dict)):
-            if decode_scores[i] > max_score:
-                max_score = decode_scores[i]
-                max_score_index = i
+    def margin_confidence(self, weights, counts):
+        '''
+        This function scores every rotation and measures how surely the best one beats the second best.
+        The score of a rotation is a sum over the counted symbols (or bigrams), so the per-item difference
+        between the two best rotations has a mean and a variance; the confidence is the probability,
+        under a normal approximation, that this mean is positive.
+        Args:
+            weights (np.ndarray): The weight of every item under every rotation, one row per rotation
+            counts (np.ndarray): The number of times every item was seen
+        Return:
+            The 'n' rotation factor, its confidence between 0 and 1 and the scores list
+        '''
+        best, confidence, scores = self.margin_confidences(weights, counts[np.newaxis])
+        return int(best[0]), float(confidence[0]), scores[0].tolist()
 
-        return decode_list[max_score_index], max_score_index, decode_scores
+    def margin_confidences(self, weights, counts):
+        '''
+        This function is margin_confidence for many messages at once, with one matrix product.
+        Args:
+            weights (np.ndarray): The weight of every item under every rotation, one row per rotation
+            counts (np.ndarray): The counts of every message, one row per message
+        Return:
+            The arrays of the 'n' rotation factors (-1 if no rotation scores above 0) and of their
+            confidences, and the matrix of the scores (one row per message)
+        '''
+        scores = counts @ weights.T
+        rows = np.arange(len(scores))
+        best = np.argmax(scores, axis=1)
+        masked = scores.copy()
+        masked[rows, best] = -np.inf
+        second = np.argmax(masked, axis=1)
+        best[scores[rows, best] <= 0] = -1
+
+        total = counts.sum(axis=1)
+        diff = weights[best] - weights[second]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = (diff * counts).sum(axis=1) / total
+            var = (diff ** 2 * counts).sum(axis=1) / total - mean ** 2
+            z = mean * np.sqrt(total / var) / sqrt(2)
+        confidence = np.array([0.5 * (1 + erf(x)) if np.isfinite(x) else 0.0 for x in z])
+        confidence[var <= 0] = np.where(mean[var <= 0] > 0, 1.0, 0.5)
+        confidence[total < 2] = 0.0
+        return best, confidence, scores
+
+    def batch_indices(self, cipher_texts):
+        '''
+        This function converts many texts into one array of alphabet indices.
+        Args:
+            cipher_texts (list): The texts (str or bytes)
+        Return:
+            The indices of the concatenated texts (see text_indices) and the number of the text
+            every index comes from
+        '''
+        if self.alphabet.ascii:
+            texts = [text.encode() if isinstance(text, str) else text for text in cipher_texts]
+            joined = b''.join(texts)
+        else:
+            texts = [text.decode() if isinstance(text, bytes) else text for text in cipher_texts]
+            joined = ''.join(texts)
+        lengths = [len(text) for text in texts]
+        return self.text_indices(joined), np.repeat(np.arange(len(texts)), lengths)
+
+    def crack_many(self, cipher_texts, method = 'frequency', weighting = 'presence', block = 4096):
+        '''
+        This function cracks many cipher texts at once: their histograms (or bigram counts) are built
+        as one messages x symbols matrix in a single pass and every rotation of every message is scored
+        by one matrix product, so the work per message is done by NumPy instead of the interpreter.
+        The results are those of crack_caesar_frequency / crack_caesar_bigram and margin_confidence.
+        Args:
+            cipher_texts (list): The cipher texts
+            method (str): 'frequency' or 'bigram'
+            weighting (str): 'presence' or 'count', the bigram weighting
+            block (int): default 4096, the number of messages counted per pass, which bounds the memory
+        Return:
+            A list of ('n' rotation factor, its score, its confidence), one per cipher text
+        '''
+        if method == 'frequency':
+            weights = self.freq_rotations
+        elif method == 'bigram':
+            weights = self.bigram_table()
+            if weighting not in ('presence', 'count'):
+                raise ValueError(f"Unknown bigram weighting: {weighting}")
+        else:
+            raise ValueError(f"Unknown cracking method: {method}")
+
+        size = len(self.alpha_dict)
+        results = []
+        for start in range(0, len(cipher_texts), block):
+            texts = cipher_texts[start:start + block]
+            self.stats.count('chars', sum(map(len, texts)))
+            with self.stats.phase('crack_many'):
+                idx, message = self.batch_indices(texts)
+                idx = idx.astype(np.intp)
+                if method == 'frequency':
+                    known = idx < size
+                    cells = message[known] * size + idx[known]
+                else:
+                    known = (idx[:-1] < size) & (idx[1:] < size) & (message[:-1] == message[1:])
+                    cells = message[:-1][known] * size * size + idx[:-1][known] * size + idx[1:][known]
+                counts = np.bincount(cells, minlength=len(texts) * weights.shape[1]).reshape(len(texts), -1)
+                if method == 'bigram' and weighting == 'presence':
+                    counts = counts > 0
+                best, confidence, scores = self.margin_confidences(weights, counts.astype(float))
+            results.extend((int(n), float(scores[i, n]), float(c)) for i, (n, c) in enumerate(zip(best, confidence)))
+        return results
+
+    def rank_candidates(self, cipher_text, weights = None, top = 5, quad_scorer = None, validator = None,
+                        weighting = 'presence'):
+        '''
+        This function ranks the plaintext of every rotation factor without asking anything. The letter
+        and bigram scores of all rotations come from one matrix product each (see crack_histogram), the
+        quadgram scores from one pass over the matrix of every rotated text, and the dictionary scores from
+        the wordlist. Every score is normalised between 0 (worst rotation) and 1 (best rotation) and the
+        candidates are ranked by the weighted mean of the normalised scores.
+        Args:
+            cipher_text (str): The cipher text
+            weights (dict): The weight of every score of RANKING_SCORES; by default the letter and bigram
+                scores, and the quad and dictionary scores when their scorer is given, all weigh 1
+            top (int): default 5, the number of candidates returned (None for all of them)
+            quad_scorer (HillClimbing): The quadgram scorer, needed by the 'quad' score
+            validator (WordValidator): The wordlist, needed by the 'dictionary' score
+            weighting (str): 'presence' or 'count', the bigram weighting
+        Return:
+            A list of Candidate (shift, combined score, dict of the normalised scores, plaintext), best first
+        '''
+        if weights is None:
+            weights = {'letter': 1.0, 'bigram': 1.0}
+            if quad_scorer is not None:
+                weights['quad'] = 1.0
+            if validator is not None:
+                weights['dictionary'] = 1.0
+        for name in weights:
+            if name not in RANKING_SCORES:
+                raise ValueError(f"Unknown ranking score: {name}")
+        if weights.get('quad') and quad_scorer is None:
+            raise ValueError("The 'quad' score needs a quadgram scorer")
+        if weights.get('dictionary') and validator is None:
+            raise ValueError("The 'dictionary' score needs a word validator")
+
+        size = len(self.alpha_dict)
+        self.stats.count('chars', len(cipher_text))
+        with self.stats.phase('rank_candidates'):
+            raw = {}
+            if weights.get('letter'):
+                raw['letter'] = self.freq_rotations @ self.symbol_histogram(cipher_text)
+            if weights.get('bigram'):
+                raw['bigram'] = self.bigram_table() @ self.bigram_counts(cipher_text, weighting)
+            if weights.get('quad'):
+                # the text decoded by every rotation, as quadgram letter codes (26 and above for non-letters)
+                letter_codes = np.array([ord(ch.upper()) - ord('A') if 'a' <= ch.lower() <= 'z' else 26
+                                         for ch in self.alpha_dict] + [26], dtype=np.uint8)
+                idx = self.text_indices(cipher_text).astype(np.intp)
+                known = idx < size
+                block = max(1, QUAD_BLOCK // max(len(idx), 1))
+                raw['quad'] = np.concatenate([self.quad_block(idx, known, np.arange(start, min(start + block, size)),
+                                                              letter_codes, quad_scorer)
+                                              for start in range(0, size, block)])
+            if weights.get('dictionary'):
+                prefix = cipher_text[:validator.limit]
+                raw['dictionary'] = np.array([validator.score(self.decode_caesar(prefix, n)) for n in range(size)])
+
+            normalised = {}
+            for name, scores in raw.items():
+                spread = scores.max() - scores.min()
+                normalised[name] = (scores - scores.min()) / spread if spread > 0 else np.zeros(size)
+            combined = np.zeros(size)
+            for name, scores in normalised.items():
+                combined += weights[name] * scores
+            combined /= sum(weights[name] for name in normalised) or 1
+            order = sorted(range(size), key=lambda n: (-combined[n], n))[:top]
+        return [Candidate(n, float(combined[n]), {name: float(scores[n]) for name, scores in normalised.items()},
+                          self.decode_caesar(cipher_text, n)) for n in order]
+
+    def quad_block(self, idx, known, shifts, letter_codes, quad_scorer):
+        '''
+        This function computes the mean quadgram score of the text decoded by some rotations, for rank_candidates.
+        The letters of every decoded text are moved ahead of the other symbols, in order, as HillClimbing scores
+        texts without spaces; the windows left over at the end of a row are taken off its score, and rows
+        keeping different numbers of letters are compared by their mean quadgram score.
+        Args:
+            idx (np.ndarray): The alphabet indices of the cipher text
+            known (np.ndarray): Which indices are in the alphabet
+            shifts (np.ndarray): The rotation factors
+            letter_codes (np.ndarray): The quadgram letter code of every alphabet index (26 for non-letters)
+            quad_scorer (HillClimbing): The quadgram scorer
+        Return:
+            The array of the mean quadgram scores, one per rotation factor
+        '''
+        size = len(self.alpha_dict)
+        codes = letter_codes[np.where(known, (idx - shifts[:, np.newaxis]) % size, size)]
+        codes = np.take_along_axis(codes, np.argsort(codes >= 26, axis=1, kind='stable'), axis=1)
+        windows = np.maximum((codes < 26).sum(axis=1) - quad_scorer.length + 1, 0)
+        totals = quad_scorer.score_rows(codes)
+        totals -= quad_scorer.floor * (max(len(idx) - quad_scorer.length + 1, 0) - windows)
+        return np.where(windows > 0, totals / np.maximum(windows, 1), quad_scorer.floor)
+
+    def detect_shift(self, cipher_text, method = 'frequency', confidence = 0.999, start = 256,
+                     sample = False, seed = None):
+        '''
+        This function finds the rotation factor from as little of the cipher text as needed.
+        Growing prefixes (doubling from 'start' characters) or growing random samples of the text are
+        counted, and the search stops as soon as the best rotation beats the second best with the
+        requested confidence, or once as many characters as the text holds were counted.
+        Bigrams are weighted by count.
+        Args:
+            cipher_text (str): The cipher text
+            method (str): 'frequency' or 'bigram'
+            confidence (float): default 0.999, the confidence at which to stop
+            start (int): default 256, the number of characters counted first
+            sample (bool): count characters (or bigrams) at random positions instead of prefixes
+            seed (int): the seed of the random positions
+        Return:
+            The 'n' rotation factor, its confidence and the number of characters counted
+        '''
+        if method == 'frequency':
+            weights, count = self.freq_rotations, self.symbol_histogram
+            overlap = 0
+        elif method == 'bigram':
+            weights, count = self.bigram_table(), lambda text: self.bigram_counts(text, 'count')
+            overlap = 1
+        else:
+            raise ValueError(f"Unknown detection method: {method}")
+
+        rng = np.random.default_rng(seed)
+        length = len(cipher_text)
+        counts = np.zeros(weights.shape[1])
+        consumed = 0
+        size = min(start, length)
+        while True:
+            if sample:
+                positions = rng.integers(0, max(length - overlap, 1), size - consumed)
+                pieces = [cipher_text[p:p + 1 + overlap] for p in positions]
+                counts += count(('\0' if overlap else '').join(pieces))
+            else:
+                counts += count(cipher_text[max(consumed - overlap, 0):size])
+            self.stats.count('chars', size - consumed)
+            consumed = size
+            n, reached, _ = self.margin_confidence(weights, counts)
+            if reached >= confidence or consumed >= length:
+                self.stats.gauge('detect_confidence', reached)
+                return n, reached, consumed
+            size = min(2 * size, length)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', type=str, required=True, help="Name of the file containing the plaintext to be encrypted")
     parser.add_argument('-c', type=int, required=True, help="The Caesar rotation factor")
     parser.add_argument('-n', type=str, help="Name to be encoded")
+    parser.add_argument('--bigram-weighting', choices=['presence', 'count'], default='presence',
+                        help="Score each distinct bigram once (presence) or every occurrence (count)")
+    parser.add_argument('--alphabet', choices=sorted(ALPHABETS), default='english', help="Symbols which are shifted")
+    parser.add_argument('--unknown', choices=POLICIES, default='passthrough',
+                        help="Leave symbols outside the alphabet untouched, strip them or fail on them")
+    parser.add_argument('--frequency-file', type=str, default='frequencies/letter_frequencies.csv',
+                        help="Letter frequency CSV of the language of the message (see build_model.py)")
+    parser.add_argument('--bigram-file', type=str, default='frequencies/bigram_frequency.csv',
+                        help="Bigram frequency CSV of the language of the message (see build_model.py)")
+    parser.add_argument('--quadgrams', type=str, default='frequencies/english_quadgrams.txt',
+                        help="Quadgram counts of the language of the message, for the ranking (see build_model.py)")
+    parser.add_argument('--top', type=int, default=5, help="Number of ranked mono-substitution candidates printed")
+    parser.add_argument('--no-plot', action='store_true', help="Do not render the state-space graphs")
+    parser.add_argument('--stats', action='store_true', help="Print the counters and phase timings as JSON at the end")
+    parser.add_argument('--profile', type=str, help="Write a cProfile dump of the cracking to this file")
     args = parser.parse_args()
+    if not args.no_plot:
+        # the plotting stack is only loaded when graphs are wanted
+        import report
     message_file = args.f
     #print(args.n)
     n = args.c
     name = args.n
-    cipher_obj = CaesarCipher()
-    print_stdout("Read Plain Text")
-    message = read_message(message_file)
-    message = message + " " + name
-
-    cipher_text = cipher_obj.encode_caesar(message, n)
-    decoded_message = cipher_obj.decode_caesar(cipher_text[:-1 * len(name)], n)
-
-    print('Message:', decoded_message, "\n")
-    print('Encrypted Cipher Text:', cipher_text[:-1 * len(name)])
-
-    print_stdout("Encoding name")
-    print(f'Ciphertext corresponding to {name}: {cipher_text[-1 * len(name):]}')
-
-    print_stdout("Cracking using frequency analysis")
+    stats = Stats() if args.stats else None
+    cipher_obj = CaesarCipher(stats, get_alphabet(args.alphabet, args.unknown), args.frequency_file, args.bigram_file)
+    with profiled(args.profile):
+        print_stdout("Read Plain Text")
+        message = read_message(message_file, cipher_obj.alphabet)
+        message = message + " " + name
 
-    cracked, n, score_list = cipher_obj.crack_caesar_frequency(cipher_text)
-    print('Cracked Cipher Text:', cracked[:-1 * len(name)])
-    print('Cracked name:', cracked[-1 * len(name):])
-    print(f"The value of n is: {n}")
-    create_graph(n, 'root', score_list, "frequency-analysis")
+        cipher_text = cipher_obj.encode_caesar(message, n)
+        decoded_message = cipher_obj.decode_caesar(cipher_text[:-1 * len(name)], n)
 
-    print_stdout("Cracking using bigram analysis")
+        print('Message:', decoded_message, "\n")
+        print('Encrypted Cipher Text:', cipher_text[:-1 * len(name)])
 
-    cracked, n, score_list = cipher_obj.crack_caesar_bigram(cipher_text)
-    print('Cracked Cipher Text:', cracked[:-1 * len(name)])
-    print('Cracked name:', cracked[-1 * len(name):])
-    print(f"The value of n is: {n}")
-    create_graph(n, 'root', score_list, "bigram-analysis")
+        print_stdout("Encoding name")
+        print(f'Ciphertext corresponding to {name}: {cipher_text[-1 * len(name):]}')
 
-    print_stdout("Cracking using mono-alphabetic substitution")
+        print_stdout("Cracking using frequency analysis")
 
-    op = 'n'
-    possible = []
+        cracked, n, score_list = cipher_obj.crack_caesar_frequency(cipher_text)
+        print('Cracked Cipher Text:', cracked[:-1 * len(name)])
+        print('Cracked name:', cracked[-1 * len(name):])
+        print(f"The value of n is: {n}")
+        if not args.no_plot:
+            report.create_graph(n, 'root', score_list, "frequency-analysis")
 
-    for i in range(1,27):
+        print_stdout("Cracking using bigram analysis")
 
-        print(f"Iteration number: {i}")
-        cracked = cipher_obj.crack_caesar_27n(cipher_text, i)
+        cracked, n, score_list = cipher_obj.crack_caesar_bigram(cipher_text, args.bigram_weighting)
         print('Cracked Cipher Text:', cracked[:-1 * len(name)])
+        print('Cracked name:', cracked[-1 * len(name):])
+        print(f"The value of n is: {n}")
+        if not args.no_plot:
+            report.create_graph(n, 'root', score_list, "bigram-analysis")
+
+        print_stdout("Cracking using mono-alphabetic substitution")
+
+        # every rotation is ranked by its letter, bigram, quadgram and dictionary scores, nothing is asked
+        ranking = cipher_obj.rank_candidates(cipher_text, top=None, quad_scorer=HillClimbing(args.quadgrams),
+                                             validator=WordValidator(), weighting=args.bigram_weighting)
+        for rank, candidate in enumerate(ranking[:args.top], 1):
+            details = ', '.join(f"{name} {score:.2f}" for name, score in candidate.scores.items())
+            print(f"Rank {rank}: n = {candidate.shift}, score {candidate.score:.3f} ({details}),"
+                  f" name: {candidate.plaintext[-1 * len(name):]}")
         print_stdout(30 * "-")
-        # creating a list with all the possible name decodings for graph label
-        possible.append(cracked[-1 * len(name):])
-
-        op = input("Type 'y' if it seems valid, else 'n': ")
-        if op == 'y':
-
-            print('Cracked name:', cracked[-1 * len(name):])
-            for j in range(i+1, 27):
-                #add space labels for remaining 
-                possible.append(' ')
-
-            create_straight_graph(i, 'root', "mono-sub", possible)
-            break
\ No newline at end of file
+        best = ranking[0]
+        print('Cracked Cipher Text:', best.plaintext[:-1 * len(name)])
+        print('Cracked name:', best.plaintext[-1 * len(name):])
+        print(f"The value of n is: {best.shift}")
+
+        # the graph has a node for every rotation factor, labelled by its rank and name decoding
+        ranks = {candidate.shift: rank for rank, candidate in enumerate(ranking, 1)}
+        by_shift = {candidate.shift: candidate.plaintext for candidate in ranking}
+        possible = [f"{ranks[i]}: {by_shift[i][-1 * len(name):]}" for i in range(1, len(cipher_obj.alpha_dict))]
+        if not args.no_plot:
+            report.create_straight_graph(best.shift, 'root', "mono-sub", possible)
+
+    if stats:
+        print(json.dumps(stats.snapshot(), indent=1))
@@ -1,13 +1,25 @@
-from random import shuffle, randint
-from math import log10
-import sys
+from random import randint
+from functools import lru_cache
+from itertools import count, islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import random
+import signal
+import os
+import copy
+from dataclasses import dataclass, field
+from collections import namedtuple
+import time
+import json
 import argparse
 import numpy as np
-from scipy.interpolate import interp1d
-import matplotlib.pyplot as plt
-import string
-import matplotlib.pyplot as plt
-import networkx as nx
+from strategies import HillClimb, STRATEGIES, polish
+from tables import load_table, NGRAM_HEADER
+from instrument import NULL_STATS, Stats, profiled
+from wordlist import WordValidator
+from alphabet import POLICIES, get_alphabet
+from keys import Key
+from score_cache import ScoreCache, cipher_identity
+from checkpoint import append_trace, cipher_digest, load_checkpoint, load_trace, save_checkpoint
 
 def frequency_csv_read():
     '''
@@ -24,67 +36,6 @@ def frequency_csv_read():
     f.close()
     return freq_dict
 
-def create_labels(score_list, edge):
-    '''
-    This function creates the labels for the networkx graph edges.
-    Args:
-        score_list (list): List of the scores obtained via letter frequency/bigram frequency
-        edge (list[list]): A list containing pair list of each edge
-    Return:
-        labels which is a dict{tuple: value}
-    '''
-    labels = {}
-    count = 0
-    for i in edge:
-        test = (i[0], i[1])
-        labels[test] = score_list[count]
-        count = count + 1
-    #print(labels)
-    return labels
-
-def create_straight_graph(selected, root, labels):
-    '''
-    This function creates a straight graph with no edge labels
-    Args:
-        selected (int): The 'n' caesar rotation value chosen
-        root (str): The root of the graph
-        labels (list): A list of labels for the edges
-    '''
-
-    edge = [[root, 1]]
-    for i in range(1,selected[-1]):
-        edge.append([i, i+1])
-    #print(edge)
-    G = nx.Graph()
-    G.add_edges_from(edge)
-    pos = nx.spring_layout(G, scale=5)
-    plt.figure()
-
-    #color_map = ['yellow' if node in selected else 'pink' for node in G]  
-    color_map =[]
-    for node in G:
-        if node == selected[-1]:
-            color_map.append('green')
-
-        elif node in selected:
-            color_map.append('yellow')
-        
-        else:
-            color_map.append('pink')
-         
-    #graph = nx.draw_networkx(G,pos, node_color=color_map) # node lables
-
-    nx.draw(
-        G, pos, edge_color='black', width=1, linewidths=1,
-        node_size=400, node_color=color_map, alpha=0.9,
-        labels={node: node for node in G.nodes()}
-    )
-    nx.draw_networkx_edge_labels(G, pos, 
-    edge_labels = create_labels(labels, edge), font_color='red', font_size=8,
-    rotate=False)
-
-    plt.savefig("states/" + "soln" + ".png")
-
 def swap_chars(key):
     '''
     This function swaps the letters present in a key of two randomly selected indices.
@@ -98,6 +49,15 @@ def swap_chars(key):
     key[i], key[j] = key[j], key[i]
     return key
 
+@lru_cache(maxsize=None)
+def plain_alphabet():
+    '''
+    This function returns the plaintext alphabet the key positions map to, read only once.
+    Return:
+        The 26 letters in decreasing order of frequency, in upper case
+    '''
+    return ''.join(frequency_csv_read().keys())[:26].upper()
+
 def decrypt(cipher, key):
     '''
     This function takes in the ciphertext and the decyphering key to return the plaintext.
@@ -106,116 +66,465 @@ def decrypt(cipher, key):
         key (str): The key used for decryption
     '''
     #print(''.join(frequency_csv_read().keys()))
-    letter_freq = ''.join(frequency_csv_read().keys())[:26].upper()
-    plaintext = ''
+    # the key maps plaintext to ciphertext, so its inverse is a plain translation table
+    return cipher.translate(str.maketrans(''.join(key), plain_alphabet()))
+
+def decrypt_lookup(key):
+    '''
+    This function builds the inverse of a key as a table of letter codes (A = 0).
+    Args:
+        key (str): The key used for decryption
+    Return:
+        A uint8 array of 256 entries mapping a cipher letter code to its plain letter code,
+        codes which are not letters map to themselves
+    '''
+    lookup = np.arange(256, dtype=np.uint8)
+    letters = np.frombuffer(''.join(key).encode(), dtype=np.uint8) - ord('A')
+    lookup[letters] = np.frombuffer(plain_alphabet().encode(), dtype=np.uint8) - ord('A')
+    return lookup
+
+def decrypt_codes(cipher_codes, key):
+    '''
+    This function decrypts a ciphertext already converted by HillClimbing.encode,
+    so that the result can be scored without building a string.
+    Args:
+        cipher_codes (np.ndarray): The letter codes of the ciphertext
+        key (str): The key used for decryption
+    Return:
+        The letter codes of the plaintext
+    '''
+    return decrypt_lookup(key)[cipher_codes]
+
+# Outcome of one restart: its score and key, the score evaluations, accepted and rejected swaps it made, its duration
+# and the hits and misses of the score cache
+RestartResult = namedtuple('RestartResult', 'restart score key evaluations accepted rejected seconds cache_hits cache_misses')
+
+def run_restart(strategy, evaluator, restart, seed, expires = None):
+    '''
+    This function runs one restart of a search strategy and measures it.
+    Args:
+        strategy (object): The search strategy (see strategies.py)
+        evaluator (SwapEvaluator): The evaluator of the ciphertext
+        restart (int): The restart number
+        seed (int): The seed of the restart
+        expires (float): The wall-clock time (time.time()) at which the search stops early, none by default
+    Return:
+        A RestartResult
+    '''
+    accepted = evaluator.accepted
+    swaps = evaluator.counts['swaps']
+    cache = evaluator.cache
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    start = time.perf_counter()
+    score, key, evaluations = strategy.search(evaluator, random.Random(seed), expires)
+    seconds = time.perf_counter() - start
+    accepted = evaluator.accepted - accepted
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    return RestartResult(restart, score, key, evaluations, accepted, evaluator.counts['swaps'] - swaps - accepted,
+                         seconds, hits, misses)
 
-    for c in cipher:
-        plaintext += letter_freq[key.index(c)]
+# evaluator of a worker process, built once by _init_worker
+_worker_evaluator = None
 
-    return plaintext
+def _init_worker(scorer, cipher, cache = None):
+    '''
+    This function initialises a worker process with its own evaluator of the ciphertext.
+    Interrupts are left to the parent process, which shuts the pool down.
+    Args:
+        scorer (HillClimbing): The quadgram scorer, shared read-only by all restarts
+        cipher (str): The ciphertext
+        cache (ScoreCache): The score cache, of which the worker keeps its own copy
+    '''
+    global _worker_evaluator
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_evaluator = SwapEvaluator(scorer, cipher, cache)
 
-def plot_hill_graph(iters, fitness_values):
+def _run_restart(task):
     '''
-    This function plots a graph of the fitness score values obtained across iterations.
+    This function runs one restart inside a worker process.
     Args:
-        iters (list): A list of all the iteration values
-        fitness_values (list): A list of all the fitness score values
+        task (tuple): The restart number, its seed, the search strategy and its deadline
+    Return:
+        A RestartResult
     '''
-    x = np.array(iters)
-    y = np.array(fitness_values)
+    restart, seed, strategy, expires = task
+    return run_restart(strategy, _worker_evaluator, restart, seed, expires)
 
-    cubic_interpolation_model = interp1d(x, y, kind = "cubic")
-    X_=np.linspace(x.min(), x.max(), 500)
-    Y_= cubic_interpolation_model(X_)
+def restart_stream(scorer, cipher, workers = 1, restarts = None, seed = None, strategy = None, cache = None,
+                   skip = (), expires = None):
+    '''
+    This function runs independent random restarts and yields their results as they complete.
+    Each restart draws its own seed from a generator seeded with 'seed', so a run can be reproduced
+    whatever the number of workers.
+    Args:
+        scorer (HillClimbing): The quadgram scorer
+        cipher (str): The ciphertext
+        workers (int): default 1, the number of processes, None for one per core
+        restarts (int): the number of restarts, unbounded by default
+        seed (int): the seed of the restarts, random by default
+        strategy (object): the search run by every restart (see strategies.py), HillClimb() by default
+        cache (ScoreCache): the score cache of the evaluators; every worker process fills its own copy,
+            whose hits and misses are added to this one
+        skip (set): the restart numbers not to run, already done by a checkpointed run
+        expires (float): the wall-clock time (time.time()) at which the restarts in flight stop early
+    Return:
+        A generator of RestartResult
+    '''
+    rng = random.Random(seed)
+    strategy = strategy or HillClimb()
+    numbers = count(1) if restarts is None else range(1, restarts + 1)
+    # the seed of a skipped restart is drawn all the same, so that the others keep theirs
+    tasks = ((restart, restart_seed, strategy, expires) for restart, restart_seed in
+             ((restart, rng.getrandbits(64)) for restart in numbers) if restart not in skip)
+    workers = workers or os.cpu_count()
+
+    if workers == 1:
+        evaluator = SwapEvaluator(scorer, cipher, cache)
+        for restart, restart_seed, _, _ in tasks:
+            yield run_restart(strategy, evaluator, restart, restart_seed, expires)
+        return
 
-    plt.plot(X_, Y_)
-    plt.title("Decrypted Ciphertext across iterations")
-    plt.xlabel("Iterations")
-    plt.ylabel("Decryption score")
-    plt.savefig("states/hillclimbing.png")
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(scorer, cipher, cache))
+    try:
+        # keep a couple of restarts queued per worker so that none of them idles
+        pending = {executor.submit(_run_restart, task) for task in islice(tasks, 2 * workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for task in islice(tasks, 1):
+                    pending.add(executor.submit(_run_restart, task))
+                result = future.result()
+                if cache is not None:
+                    cache.hits += result.cache_hits
+                    cache.misses += result.cache_misses
+                yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
-def crack_caesar_quad(cipher, name_length, enc_name, max_iter = 1000):
+@dataclass
+class QuadResult:
     '''
-    This is an auxiliary function to crack the ciphertext.
+    The outcome of a hill-climb run.
+    key (Key): The best key found (None if no restart finished)
+    score (float): The quadgram score of that key
+    plaintext (str): The ciphertext decrypted with that key
+    restarts (int): The number of restarts completed
+    elapsed (float): The wall-clock duration of the run in seconds
+    stop_reason (str): 'restarts', 'time_limit', 'patience', 'target_score', 'validated' or 'interrupted'
+    evaluations (int): The number of score evaluations of the run
+    evaluations_to_best (int): The number of score evaluations until the best key was found
+    trace (list): (restart, score, best score so far, evaluations so far) of every restart, in completion order
+    '''
+    key: Key
+    score: float
+    plaintext: str
+    restarts: int
+    elapsed: float
+    stop_reason: str
+    evaluations: int = 0
+    evaluations_to_best: int = 0
+    trace: list = field(default_factory=list)
+
+def solve_quad(cipher, scorer = None, seed = None, restarts = None, time_limit = None, patience = None,
+               target_score = None, max_iter = 1000, workers = 1, callback = None, strategy = None,
+               stats = None, validator = None, cache = None, checkpoint = None, checkpoint_every = 60.0,
+               resume = False):
+    '''
+    This function cracks a ciphertext by random-restart hill climbing within the given bounds.
+    Without any stopping criterion it runs until interrupted. It never exits the process:
+    an interrupt ends the run and the best result so far is returned.
+    With a checkpoint file, the state of the run (best key and score, seed and counters) is saved every
+    'checkpoint_every' seconds and when the run ends, the new entries of the trace being appended to a
+    file next to it (see checkpoint.py), and a resumed run goes on with the restarts not done yet, with
+    the seeds they would have had.
     Args:
         cipher (str): The ciphertext
-        max_iter (int): default 1000, the maximum iterations for which the cryptanalysis is to be performed
+        scorer (HillClimbing): The quadgram scorer, english_quadgrams.txt by default
+        seed (int): the seed of the restarts, random by default
+        restarts (int): the number of restarts after which to stop
+        time_limit (float): the number of seconds after which the run stops, the restarts in flight returning
+            the best key they met (such a restart counts as done)
+        patience (int): stop after this many restarts without improvement of the best score
+        target_score (float): stop as soon as a restart reaches this score
+        max_iter (int): default 1000, the number of swaps tried per restart of the default hill climb
+        workers (int): default 1, the number of processes running restarts in parallel, None for one per core
+        callback (function): called as callback(itr, score, key, improved) after every restart
+        strategy (object): the search run by every restart (see strategies.py), HillClimb(max_iter) by default
+        stats (Stats): gathers counters (restarts, evaluations, accepted and rejected swaps), the time of
+            every restart and of the table load, and prints the periodic progress line (see instrument.py)
+        validator (WordValidator): polish every new best key until no swap improves it (a near miss is a
+            few swaps away from the right key) and stop as soon as it decrypts to a text the validator accepts
+        cache (ScoreCache): reuse the scores of the keys met before, none by default
+        checkpoint (str): the JSON file where the state of the run is saved, none by default; the trace is
+            kept in the same file name ending in '.trace'
+        checkpoint_every (float): default 60, the seconds between two saves of the checkpoint
+        resume (bool): go on from the checkpoint if it exists ('seed' is then ignored); the restarts, patience,
+            evaluations and trace count those of the previous runs, the time limit only this one
+    Return:
+        A QuadResult
     '''
-    cipher_obj = HillClimbing('frequencies/english_quadgrams.txt')
+    stats = stats or NULL_STATS
+    if scorer is None:
+        scorer = HillClimbing('frequencies/english_quadgrams.txt', stats)
+
+    start = time.monotonic()
     bestkey = None
     bestfit = -1 * float('inf')
+    trace = []
+    since_best = 0
+    stop_reason = 'restarts'
+    evaluations = 0
+    evaluations_to_best = 0
+    previous_elapsed = 0.0
+    # the seeds of the restarts all derive from this one, which is all a checkpoint needs to keep of them
+    seed = seed if seed is not None else random.getrandbits(64)
+    # entries of the trace already in the trace file of the checkpoint, None before the first save of a new run
+    written = None
+
+    state = load_checkpoint(checkpoint, cipher) if checkpoint and resume else None
+    if state is not None:
+        seed = state['seed']
+        trace = load_trace(checkpoint, state['restarts'])
+        written = len(trace)
+        if state['best_key'] is not None:
+            bestkey = Key(state['best_key'])
+            bestfit = state['best_score']
+        evaluations = state['evaluations']
+        evaluations_to_best = state['evaluations_to_best']
+        previous_elapsed = state['elapsed']
+        since_best = len(trace) - 1 - next((k for k, entry in enumerate(trace) if entry[2] == bestfit), -1)
+
+    def save():
+        # the trace goes to its own file, a save appending the restarts done since the previous one
+        nonlocal written
+        append_trace(checkpoint, trace[written or 0:], truncate=written is None)
+        written = len(trace)
+        save_checkpoint(checkpoint, {'cipher': cipher_digest(cipher), 'seed': seed,
+                                     'best_key': str(bestkey) if bestkey is not None else None,
+                                     'best_score': bestfit if bestkey is not None else None,
+                                     'restarts': len(trace), 'evaluations': evaluations,
+                                     'evaluations_to_best': evaluations_to_best,
+                                     'elapsed': previous_elapsed + time.monotonic() - start})
 
-    fitness_values = []
-    iters = []
+    expires = time.time() + time_limit if time_limit is not None else None
+    results = restart_stream(scorer, cipher, workers, restarts, seed, strategy or HillClimb(max_iter), cache,
+                             {entry[0] for entry in trace}, expires)
+    saved = time.monotonic()
+    polisher = None
 
-    itr = 0
+    try:
+        for itr, (restart, score, key, restart_evaluations, accepted, rejected, seconds, hits, misses) in enumerate(results, 1):
+            evaluations = evaluations + restart_evaluations
+            stats.count('restarts')
+            stats.count('evaluations', restart_evaluations)
+            stats.count('accepted', accepted)
+            stats.count('rejected', rejected)
+            stats.add_time('restart', seconds)
+            if cache is not None:
+                stats.count('cache_hits', hits)
+                stats.count('cache_misses', misses)
+            improved = score > bestfit
+            if improved:
+                bestfit = score
+                bestkey = key
+                if validator is not None:
+                    if polisher is None:
+                        polisher = SwapEvaluator(scorer, cipher, cache)
+                    polisher.set_key(key)
+                    evaluations = evaluations + polish(polisher)
+                    bestfit = polisher.score
+                    bestkey = polisher.key.copy()
+                since_best = 0
+                evaluations_to_best = evaluations
+            else:
+                since_best = since_best + 1
+            trace.append((restart, score, bestfit, evaluations))
+            stats.gauge('best_score', bestfit)
+            stats.maybe_report()
+            if checkpoint and time.monotonic() - saved >= checkpoint_every:
+                save()
+                saved = time.monotonic()
+            if callback is not None:
+                # a new best key is shown as polished
+                callback(itr, bestfit if improved else score, bestkey if improved else key, improved)
+
+            if target_score is not None and bestfit >= target_score:
+                stop_reason = 'target_score'
+                break
+            if validator is not None and improved and validator.is_valid(decrypt(cipher, bestkey)):
+                stop_reason = 'validated'
+                break
+            if patience is not None and since_best >= patience:
+                stop_reason = 'patience'
+                break
+            if time_limit is not None and time.monotonic() - start >= time_limit:
+                stop_reason = 'time_limit'
+                break
+
+    except KeyboardInterrupt:
+        stop_reason = 'interrupted'
+    finally:
+        results.close()
+        if checkpoint:
+            save()
+
+    with stats.phase('decrypt'):
+        plaintext = decrypt(cipher, bestkey) if bestkey is not None else ''
+    return QuadResult(bestkey, bestfit, plaintext, len(trace), previous_elapsed + time.monotonic() - start,
+                      stop_reason, evaluations, evaluations_to_best, trace)
+
+def crack_caesar_quad(cipher, name_length, enc_name, max_iter = 1000, workers = 1, restarts = None,
+                      seed = None, target_score = None, patience = None, strategy = None, plot = True,
+                      stats = None, validator = None, cache = None, checkpoint = None, checkpoint_every = 60.0,
+                      resume = False, quadgrams = 'frequencies/english_quadgrams.txt'):
+    '''
+    This is an auxiliary function to crack the ciphertext.
+    The search runs until interrupted unless one of the stopping criteria is given.
+    Args:
+        cipher (str): The ciphertext
+        max_iter (int): default 1000, the maximum iterations for which the cryptanalysis is to be performed
+        workers (int): default 1, the number of processes running restarts in parallel, None for one per core
+        restarts (int): the number of restarts after which to stop
+        seed (int): the seed of the restarts, random by default
+        target_score (float): stop as soon as a restart reaches this score
+        patience (int): stop after this many restarts without improvement of the best score
+        strategy (object): the search run by every restart (see strategies.py), HillClimb(max_iter) by default
+        plot (bool): default True, render the score and solution graphs (loading the plotting stack)
+        stats (Stats): gathers the counters and timings of the run (see solve_quad)
+        validator (WordValidator): stop once a new best key, polished, decrypts to a text recognised as English
+        cache (ScoreCache): reuse the scores of the keys met before (see solve_quad)
+        checkpoint (str): the file where the state of the run is saved (see solve_quad)
+        checkpoint_every (float): default 60, the seconds between two saves of the checkpoint
+        resume (bool): go on from the checkpoint if it exists
+        quadgrams (str): the 'NGRAM count' file of the quadgram scores (see build_model.py)
+    Return:
+        The QuadResult of the run
+    '''
     name_crack = []
     local_max = []
 
-    while True:
-        try: 
-            node = list(string.ascii_uppercase)
-            shuffle(node)
-            node_score = cipher_obj.score(decrypt(cipher, node))
-            
-            itr = itr + 1
-            for i in range(max_iter):
-                child = node.copy()
-                child = swap_chars(child)
-                child_score = cipher_obj.score(decrypt(cipher, child))
-
-                if child_score > node_score:
-                    #swap parent node and child if child score is better
-                    node = child
-                    node_score = child_score
-
-            if node_score > bestfit:
-                bestfit = node_score
-                bestkey = node
-                print('Iteration: ', itr)
-                print('Best score so far:', node_score)
-                cracked = decrypt(cipher, node).lower()
-                print('Cracked Cipher Text:', cracked, '\n')
-                print('Cracked Name Text:', cracked[-1 * name_length:], '\n')
-                local_max.append(itr)
-
-            name_crack.append(cracked[-1 * name_length:]) 
-            fitness_values.append(node_score)
-            iters.append(itr)
-            
-        except KeyboardInterrupt:
-            print('End of decryption')
-            print(f"The rotation factor is {abs(ord(enc_name[0])-ord(name_crack[-1][0]))}")
-            plot_hill_graph(iters, fitness_values)
-            create_straight_graph(local_max, "root", name_crack)
-            #print(name_crack)
-            #print(local_max)
-                      
-            sys.exit()
+    def show_restart(itr, score, key, improved):
+        if improved:
+            print('Iteration: ', itr)
+            print('Best score so far:', score)
+            cracked = decrypt(cipher, key).lower()
+            print('Cracked Cipher Text:', cracked, '\n')
+            print('Cracked Name Text:', cracked[-1 * name_length:], '\n')
+            local_max.append(itr)
+            name_crack.append(cracked[-1 * name_length:])
+        else:
+            # a resumed run may not improve on the best key of its checkpoint
+            name_crack.append(name_crack[-1] if name_crack else '')
+
+    result = solve_quad(cipher, scorer=HillClimbing(quadgrams, stats), seed=seed, restarts=restarts, patience=patience, target_score=target_score, max_iter=max_iter,
+                        workers=workers, callback=show_restart, strategy=strategy, stats=stats,
+                        validator=validator, cache=cache, checkpoint=checkpoint, checkpoint_every=checkpoint_every,
+                        resume=resume)
+
+    print('End of decryption')
+    if result.key is not None:
+        cracked_name = result.plaintext.lower()[-1 * name_length:]
+        print(f"The rotation factor is {abs(ord(enc_name[0])-ord(cracked_name[0]))}")
+        print(f"Score evaluations: {result.evaluations} ({result.evaluations_to_best} to reach the best key)")
+    if name_crack and plot:
+        import report
+        report.plot_hill_graph(range(1, result.restarts + 1), [score for _, score, _, _ in result.trace])
+        # a resumed run which never improved on its checkpoint has no solution path of its own
+        if local_max:
+            report.create_solution_graph(local_max, "root", name_crack)
+    #print(name_crack)
+    #print(local_max)
+
+    return result
 
 class HillClimbing:
     
-    def __init__(self, file_name):
+    def __init__(self, file_name, stats = None):
         '''
         This is the initialising constructor.
+        The log probabilities of the quadgrams are stored in a dense array of 26^4 entries indexed by
+        the base-26 value of the quadgram, unseen quadgrams holding the floor value.
+        The array is memory-mapped from the compiled table cache (see tables.py).
         Args:
             file_name (str): The file to obtain the quadgram frequencies.
+            stats (Stats): records the table load time (see instrument.py)
         '''
-        self.quadgram = {}
+        self.file_name = file_name
+        with (stats or NULL_STATS).phase('table_load'):
+            table = load_table(file_name, 'ngrams')
+        length, self.total_frequency, self.floor = table[:NGRAM_HEADER].tolist()
+        self.length = int(length) # it is 4 because quadgrams are used
+        #print(self.length)
+        #print(self.floor)
+        self.quadgram = table[NGRAM_HEADER:]
 
-        for line in open(file_name).readlines():
-            key,count = line.split(' ') 
-            self.quadgram[key] = int(count) # explicitely convert to int to take sum
+    def __reduce__(self):
+        '''
+        This function makes pickling (e.g. to worker processes) send the file name only, the
+        receiving process mapping the same compiled table instead of copying it.
+        '''
+        return (HillClimbing, (self.file_name,))
 
-        self.length = len(key) # it is 4 because quadgrams are used
-        #print(self.length)
-        self.total_frequency = sum(self.quadgram.values())
+    def encode(self, text):
+        '''
+        This function converts a text into an array of letter codes.
+        Args:
+            text (str): The text to be converted
+        Return:
+            A uint8 array of letter codes, A = 0 ... Z = 25 and anything else >= 26
+        '''
+        return np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8) - ord('A')
 
-        #compute log of frequency %
-        for key in self.quadgram.keys():
-            self.quadgram[key] = log10(float(self.quadgram[key])/self.total_frequency)
-        self.floor = log10(0.01/self.total_frequency)
-        #print(self.floor)
+    def quadgram_scores(self, windows):
+        '''
+        This function looks up the scores of many quadgrams at once.
+        Args:
+            windows (list): The letter codes of the quadgrams, one array per position in the quadgram,
+                all of the same shape
+        Return:
+            The array of the scores, of that shape, a quadgram with a non-letter scoring the floor value
+        '''
+        idx = np.zeros(windows[0].shape, dtype=np.intp)
+        valid = np.ones(windows[0].shape, dtype=bool)
+        for window in windows:
+            idx = idx * 26 + window
+            valid &= window < 26
+        return np.where(valid, self.quadgram[np.where(valid, idx, 0)], self.floor)
+
+    def score_codes(self, codes):
+        '''
+        This function computes the quadgram score of a text already converted by encode.
+        Args:
+            codes (np.ndarray): The letter codes of the text
+        Return:
+            The score, a quadgram with a non-letter scoring the floor value
+        '''
+        return float(self.score_rows(codes[np.newaxis])[0])
+
+    def score_rows(self, codes):
+        '''
+        This function is score_codes for many texts of the same length at once, one per row.
+        Args:
+            codes (np.ndarray): The letter codes of the texts, one row per text
+        Return:
+            The array of the scores
+        '''
+        count = codes.shape[1] - self.length + 1
+        if count <= 0:
+            return np.zeros(len(codes))
+        return self.quadgram_scores([codes[:, k:k + count] for k in range(self.length)]).sum(axis=1)
+
+    def score_windows(self, codes, starts):
+        '''
+        This function computes the quadgram score of selected windows of an encoded text.
+        Args:
+            codes (np.ndarray): The letter codes of the text
+            starts (np.ndarray): The start positions of the quadgrams to be scored
+        Return:
+            The summed score of those quadgrams
+        '''
+        return float(self.quadgram_scores([codes[starts + k] for k in range(self.length)]).sum())
 
     def score(self, text):
         '''
@@ -223,24 +532,182 @@ class HillClimbing:
         Args:
             text (str): The potential cracked ciphertext
         '''
-        score = 0
-        quadgram = self.quadgram.__getitem__ 
+        # add corresponding score if in quadgram else add the small negative factor
+        return self.score_codes(self.encode(text))
+
+
+class SwapEvaluator:
+
+    def __init__(self, scorer, cipher, cache = None):
+        '''
+        This is the initialising constructor.
+        The positions of every cipher letter, and the quadgram windows they touch, are indexed once
+        so that swapping two letters of the key only rescores those windows.
+        Args:
+            scorer (HillClimbing): The quadgram scorer
+            cipher (str): The ciphertext
+            cache (ScoreCache): where the score of every key met is kept, so that a key met again is not rescored
+        '''
+        self.scorer = scorer
+        self.cipher_codes = scorer.encode(cipher)
+        self.cache = cache
+        self.cipher_id = cipher_identity(self.cipher_codes)
+        self.key = None
+        self.lookup = None
+        self.plain = None
+        self.score = None
+        # shared with the clones, so that a search counts the work of all its replicas
+        self.counts = {'evaluations': 0, 'swaps': 0, 'accepted': 0}
+
+        count = len(self.cipher_codes) - scorer.length + 1
+        self.positions = []
+        self.windows = []
+        for letter in range(26):
+            pos = np.flatnonzero(self.cipher_codes == letter)
+            starts = (pos[:, None] - np.arange(scorer.length)).ravel()
+            self.positions.append(pos)
+            self.windows.append(np.unique(starts[(starts >= 0) & (starts < count)]))
+
+    def set_key(self, key):
+        '''
+        This function decrypts the ciphertext with a new key and scores it in full.
+        Args:
+            key (list or Key): The key used for decryption
+        Return:
+            The score of the decrypted text
+        '''
+        self.key = Key(key)
+        self.lookup = decrypt_lookup(self.key)
+        self.plain = self.lookup[self.cipher_codes]
+        self.counts['evaluations'] += 1
+        self.score = self.cache.get(self.cipher_id, self.key.to_bytes()) if self.cache is not None else None
+        if self.score is None:
+            self.score = self.scorer.score_codes(self.plain)
+            if self.cache is not None:
+                self.cache.put(self.cipher_id, self.key.to_bytes(), self.score)
+        return self.score
+
+    @property
+    def evaluations(self):
+        '''
+        The number of score evaluations (full or delta) made by this evaluator and its clones.
+        '''
+        return self.counts['evaluations']
+
+    @property
+    def accepted(self):
+        '''
+        The number of swaps applied by this evaluator and its clones.
+        '''
+        return self.counts['accepted']
+
+    def clone(self):
+        '''
+        This function copies the evaluator, sharing the index of the ciphertext and the counters but not the current key.
+        Return:
+            The new SwapEvaluator
+        '''
+        other = copy.copy(self)
+        if self.key is not None:
+            other.key = self.key.copy()
+            other.lookup = self.lookup.copy()
+            other.plain = self.plain.copy()
+        return other
 
-        for i in range(len(text)-self.length+1):
-            # add corresponding score if in quadgram else add the small negative factor
-            if text[i:i+self.length] in self.quadgram: 
-                score += quadgram(text[i:i+self.length])
-            else: 
-                score += self.floor          
-        return score
+    def swap_delta(self, i, j):
+        '''
+        This function computes the change of score if the letters at indices i and j of the key were swapped.
+        The key and the decrypted text are left unchanged.
+        Args:
+            i (int): The first index of the key
+            j (int): The second index of the key
+        Return:
+            The score of the swapped key minus the current score
+        '''
+        a = self.key.codes[i]
+        b = self.key.codes[j]
+        if a == b:
+            return 0.0
+        self.counts['evaluations'] += 1
+        self.counts['swaps'] += 1
+        if self.cache is not None:
+            self.key.swap(i, j)
+            packed = self.key.to_bytes()
+            self.key.undo()
+            cached = self.cache.get(self.cipher_id, packed)
+            if cached is not None:
+                return cached - self.score
+        starts = np.union1d(self.windows[a], self.windows[b])
+        old = self.scorer.score_windows(self.plain, starts)
+        pos_a, pos_b = self.positions[a], self.positions[b]
+        self.plain[pos_a] = self.lookup[b]
+        self.plain[pos_b] = self.lookup[a]
+        new = self.scorer.score_windows(self.plain, starts)
+        self.plain[pos_a] = self.lookup[a]
+        self.plain[pos_b] = self.lookup[b]
+        if self.cache is not None:
+            self.cache.put(self.cipher_id, packed, self.score + new - old)
+        return new - old
+
+    def apply_swap(self, i, j, delta):
+        '''
+        This function swaps the letters at indices i and j of the key.
+        Args:
+            i (int): The first index of the key
+            j (int): The second index of the key
+            delta (float): The change of score returned by swap_delta for this swap
+        '''
+        a = self.key.codes[i]
+        b = self.key.codes[j]
+        self.key.swap(i, j)
+        self.lookup[a], self.lookup[b] = self.lookup[b], self.lookup[a]
+        self.plain[self.positions[a]] = self.lookup[a]
+        self.plain[self.positions[b]] = self.lookup[b]
+        self.score += delta
+        self.counts['accepted'] += 1
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', type=str, required=True, help="Name of the file containing the ciphertext to be decrypted")
     parser.add_argument('-n', type=str, help="Encrypted Name to be decrypted")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="Number of processes running restarts in parallel (0 for one per core)")
+    parser.add_argument('--restarts', type=int, help="Stop after this many restarts")
+    parser.add_argument('--seed', type=int, help="Seed of the random restarts")
+    parser.add_argument('--target-score', type=float, help="Stop once a restart reaches this score")
+    parser.add_argument('--patience', type=int, help="Stop after this many restarts without improvement")
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='hill', help="Search run by every restart")
+    parser.add_argument('--unknown', choices=POLICIES, default='passthrough',
+                        help="Leave symbols other than letters untouched (unscored), strip them or fail on them")
+    parser.add_argument('--quadgrams', type=str, default='frequencies/english_quadgrams.txt',
+                        help="Quadgram counts of the language of the message (see build_model.py)")
+    parser.add_argument('--validate', action='store_true', help="Polish every new best key until no swap improves it and stop once its plaintext is recognised by the wordlist")
+    parser.add_argument('--cache-mb', type=float, help="Cache the scores of the keys met, in at most this many megabytes")
+    parser.add_argument('--checkpoint', type=str, help="Save the state of the search to this JSON file, periodically and at the end")
+    parser.add_argument('--checkpoint-every', type=float, default=60.0, help="Seconds between two saves of the checkpoint")
+    parser.add_argument('--resume', action='store_true', help="Go on from the checkpoint instead of starting afresh")
+    parser.add_argument('--no-plot', action='store_true', help="Do not render the score and solution graphs")
+    parser.add_argument('--stats', action='store_true', help="Print the counters and timings of the run as JSON")
+    parser.add_argument('--progress', type=float, help="Print a progress line at most every this many seconds")
+    parser.add_argument('--profile', type=str, help="Dump cProfile statistics of the run (main process only) to this file")
     args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
     name = args.n
     f = open(args.f, 'r')
-    cipher = f.read()
-    crack_caesar_quad(cipher.upper() + name.upper(), len(name), name.lower())
\ No newline at end of file
+    # the key only maps the 26 letters, the policy decides what happens to everything else
+    cipher = get_alphabet('uppercase', args.unknown).normalise(f.read().rstrip('\n').upper())
+    stats = Stats(progress_every=args.progress) if args.stats or args.progress else None
+    cache = ScoreCache(int(args.cache_mb * (1 << 20))) if args.cache_mb else None
+    with profiled(args.profile):
+        crack_caesar_quad(cipher + name.upper(), len(name), name.lower(), workers=args.workers or None,
+                          restarts=args.restarts, seed=args.seed, target_score=args.target_score,
+                          patience=args.patience, strategy=STRATEGIES[args.strategy](), plot=not args.no_plot,
+                          stats=stats, validator=WordValidator() if args.validate else None, cache=cache,
+                          checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every, resume=args.resume,
+                          quadgrams=args.quadgrams)
+    if args.stats:
+        snapshot = stats.snapshot()
+        if cache is not None:
+            snapshot['cache'] = cache.snapshot()
+        print(json.dumps(snapshot, indent=1))
\ No newline at end of file
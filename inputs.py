@@ -0,0 +1,33 @@
+import glob
+import os
+
+def list_files(inputs):
+    '''
+    This function expands the inputs of a command into the list of files to be read.
+    Args:
+        inputs (list): Directories (every file directly inside is taken) or glob patterns
+    Return:
+        The sorted list of file paths, without duplicates
+    '''
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            paths = glob.glob(item)
+        files.update(path for path in paths if os.path.isfile(path))
+    return sorted(files)
+
+def parse_size(text):
+    '''
+    This function parses a size such as 100, 10k, 1M or 100MB (decimal units).
+    Args:
+        text (str): The size
+    Return:
+        The number it stands for
+    '''
+    text = text.upper().rstrip('B')
+    units = {'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
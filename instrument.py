@@ -0,0 +1,151 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+import sys
+import time
+
+class Stats:
+
+    def __init__(self, progress_every = None, stream = None):
+        '''
+        This is the initialising constructor.
+        self.counters (dictionary): Event counts, such as score evaluations or restarts.
+        self.timings (dictionary): Total seconds spent in every phase.
+        self.calls (dictionary): Number of times every phase was timed.
+        self.gauges (dictionary): Last value of every tracked quantity, such as the best score.
+        Args:
+            progress_every (float): Print a progress line at most every this many seconds, never by default
+            stream (file): Where progress lines are printed, stderr by default
+        '''
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.gauges = {}
+        self.progress_every = progress_every
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.last_progress = self.start
+
+    def count(self, name, n = 1):
+        '''
+        This function adds to a counter.
+        Args:
+            name (str): The counter
+            n (int): default 1, the amount added
+        '''
+        self.counters[name] += n
+
+    def add_time(self, name, seconds):
+        '''
+        This function records one timed run of a phase.
+        Args:
+            name (str): The phase
+            seconds (float): Its duration
+        '''
+        self.timings[name] += seconds
+        self.calls[name] += 1
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        This function times the enclosed block as one run of a phase.
+        Args:
+            name (str): The phase
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def gauge(self, name, value):
+        '''
+        This function records the current value of a quantity.
+        Args:
+            name (str): The quantity
+            value (float): Its value
+        '''
+        self.gauges[name] = value
+
+    def snapshot(self):
+        '''
+        This function returns the statistics gathered so far.
+        Return:
+            A dict of plain values: elapsed seconds, counters, gauges and, for every phase,
+            its total seconds, number of calls and mean seconds per call
+        '''
+        return {
+            'elapsed': time.perf_counter() - self.start,
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'timings': {name: {'seconds': seconds, 'calls': self.calls[name],
+                               'mean': seconds / self.calls[name] if self.calls[name] else 0.0}
+                        for name, seconds in self.timings.items()},
+        }
+
+    def progress_line(self):
+        '''
+        This function summarises the statistics on one line.
+        Return:
+            The line
+        '''
+        elapsed = time.perf_counter() - self.start
+        fields = [f"{elapsed:.1f}s"]
+        fields += [f"{name}={value}" for name, value in sorted(self.counters.items())]
+        if elapsed and 'evaluations' in self.counters:
+            fields.append(f"evals/s={self.counters['evaluations'] / elapsed:.0f}")
+        fields += [f"{name}={value:.6g}" for name, value in sorted(self.gauges.items())]
+        return ' '.join(fields)
+
+    def maybe_report(self):
+        '''
+        This function prints a progress line if progress_every seconds passed since the last one.
+        '''
+        if self.progress_every is None:
+            return
+        now = time.perf_counter()
+        if now - self.last_progress >= self.progress_every:
+            self.last_progress = now
+            print(self.progress_line(), file=self.stream or sys.stderr)
+
+class NullStats:
+    '''
+    Stand-in for Stats when instrumentation is off: every call does nothing.
+    '''
+
+    def count(self, name, n = 1):
+        pass
+
+    def add_time(self, name, seconds):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def gauge(self, name, value):
+        pass
+
+    def maybe_report(self):
+        pass
+
+NULL_STATS = NullStats()
+
+@contextmanager
+def profiled(file_name):
+    '''
+    This function profiles the enclosed block with cProfile and dumps the pstats file,
+    to be read with e.g. python3 -m pstats. Nothing is profiled if file_name is None.
+    Args:
+        file_name (str): The file the statistics are written to
+    '''
+    if file_name is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(file_name)
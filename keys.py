@@ -0,0 +1,87 @@
+from array import array
+import string
+
+class Key:
+    '''
+    A substitution key stored as a byte array: the cipher letter code (A = 0) of every key position.
+    Swapping two positions rewrites two bytes, so a rejected move is undone as cheaply as it was made,
+    and the key hashes as 26 bytes. The inverse mapping is kept by the evaluator (SwapEvaluator.lookup).
+    It iterates, indexes and joins like the list of letters it replaces.
+    '''
+
+    __slots__ = ('codes', 'last')
+
+    def __init__(self, letters = string.ascii_uppercase):
+        '''
+        This is the initialising constructor.
+        self.codes (array): The cipher letter code of every key position.
+        self.last (tuple): The last swap, undone by undo.
+        Args:
+            letters (str, list or Key): The 26 upper case letters of the key, in key order
+        '''
+        if isinstance(letters, Key):
+            self.codes = array('B', letters.codes)
+        else:
+            self.codes = array('B', (ord(ch) - ord('A') for ch in letters))
+            if sorted(self.codes) != list(range(26)):
+                raise ValueError(f"A key is a permutation of the 26 letters: {''.join(letters)!r}")
+        self.last = None
+
+    def swap(self, i, j):
+        '''
+        This function swaps the letters at positions i and j of the key, in place.
+        Args:
+            i (int): The first position
+            j (int): The second position
+        '''
+        codes = self.codes
+        codes[i], codes[j] = codes[j], codes[i]
+        self.last = (i, j)
+
+    def undo(self):
+        '''
+        This function reverts the last swap.
+        '''
+        if self.last is not None:
+            self.swap(*self.last)
+            self.last = None
+
+    def copy(self):
+        '''
+        This function copies the key.
+        Return:
+            The new Key
+        '''
+        return Key(self)
+
+    def to_bytes(self):
+        '''
+        This function packs the key.
+        Return:
+            The 26 cipher letter codes as bytes
+        '''
+        return self.codes.tobytes()
+
+    def __getitem__(self, k):
+        return chr(self.codes[k] + ord('A'))
+
+    def __iter__(self):
+        return (chr(code + ord('A')) for code in self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __eq__(self, other):
+        if isinstance(other, Key):
+            return self.codes == other.codes
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.codes.tobytes())
+
+    def __str__(self):
+        return ''.join(self)
+
+    def __repr__(self):
+        return f"Key('{self}')"
+
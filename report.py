@@ -0,0 +1,153 @@
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+from scipy.interpolate import interp1d
+
+def create_labels(score_list, edge):
+    '''
+    This function creates the labels for the networkx graph edges.
+    Args:
+        score_list (list): List of the scores obtained via letter frequency/bigram frequency
+        edge (list[list]): A list containing pair list of each edge
+    Return:
+        labels which is a dict{tuple: value}
+    '''
+    labels = {}
+    count = 0
+    for i in edge:
+        test = (i[0], i[1])
+        labels[test] = score_list[count]
+        count = count + 1
+    #print(labels)
+    return labels
+
+def create_graph(selected, root, score_list, file_name):
+    '''
+    This function creates a graph.
+    Args:
+        selected (int): The 'n' caesar rotation value chosen
+        root (str): The root of the graph
+        score_list (list): List of the scores obtained via letter frequency/bigram frequency
+        file_name (str): The file name for saving the graph
+    '''
+    edge = []
+    
+    for i in range(len(score_list)):
+        edge.append([root, i])
+
+    G = nx.Graph()
+    G.add_edges_from(edge)
+    pos = nx.spring_layout(G, scale=5)
+    plt.figure()
+
+    color_map = ['green' if node == selected else 'pink' for node in G]     
+    #graph = nx.draw_networkx(G,pos, node_color=color_map) 
+
+    nx.draw(G, pos, edge_color='black', width=1, linewidths=1,
+    node_size=400, node_color=color_map, alpha=0.9,
+    labels={node: node for node in G.nodes()})
+
+    nx.draw_networkx_edge_labels(G, pos, 
+    edge_labels = create_labels(score_list, edge), font_color='red')
+    #plt.axis('off')
+    plt.savefig("states/" + file_name + ".png")
+
+def create_straight_graph(selected, root, file_name, labels):
+    '''
+    This function creates a straight graph with no edge labels
+    Args:
+        selected (int): The 'n' caesar rotation value chosen
+        root (str): The root of the graph
+        file_name (str): The file name for saving the graph
+        labels (list): A list of labels for each edge
+    '''
+
+    edge = [[root, 1]]
+    for i in range(1, len(labels)):
+        edge.append([i, i+1])
+    #print(edge)
+    G = nx.Graph()
+    G.add_edges_from(edge)
+    pos = nx.spring_layout(G, scale=5)
+    plt.figure()
+
+    color_map = ['green' if node == selected else 'pink' for node in G]   
+    #graph = nx.draw_networkx(G,pos, node_color=color_map) # node lables
+
+    nx.draw(
+        G, pos, edge_color='black', width=1, linewidths=1,
+        node_size=400, node_color=color_map, alpha=0.9,
+        labels={node: node for node in G.nodes()}
+    )
+    nx.draw_networkx_edge_labels(G, pos, 
+    edge_labels = create_labels(labels, edge), font_color='red', font_size=8,
+    rotate=False)
+
+    plt.savefig("states/" + file_name + ".png")
+
+def create_solution_graph(selected, root, labels):
+    '''
+    This function creates the straight graph of the hill-climb solution path.
+    Args:
+        selected (list): The restarts which improved the best score, the last one being the goal
+        root (str): The root of the graph
+        labels (list): A list of labels for the edges
+    '''
+
+    edge = [[root, 1]]
+    for i in range(1,selected[-1]):
+        edge.append([i, i+1])
+    #print(edge)
+    G = nx.Graph()
+    G.add_edges_from(edge)
+    pos = nx.spring_layout(G, scale=5)
+    plt.figure()
+
+    #color_map = ['yellow' if node in selected else 'pink' for node in G]  
+    color_map =[]
+    for node in G:
+        if node == selected[-1]:
+            color_map.append('green')
+
+        elif node in selected:
+            color_map.append('yellow')
+        
+        else:
+            color_map.append('pink')
+         
+    #graph = nx.draw_networkx(G,pos, node_color=color_map) # node lables
+
+    nx.draw(
+        G, pos, edge_color='black', width=1, linewidths=1,
+        node_size=400, node_color=color_map, alpha=0.9,
+        labels={node: node for node in G.nodes()}
+    )
+    nx.draw_networkx_edge_labels(G, pos, 
+    edge_labels = create_labels(labels, edge), font_color='red', font_size=8,
+    rotate=False)
+
+    plt.savefig("states/" + "soln" + ".png")
+
+def plot_hill_graph(iters, fitness_values):
+    '''
+    This function plots a graph of the fitness score values obtained across iterations.
+    Args:
+        iters (list): A list of all the iteration values
+        fitness_values (list): A list of all the fitness score values
+    '''
+    x = np.array(iters)
+    y = np.array(fitness_values)
+
+    if len(x) >= 4:
+        cubic_interpolation_model = interp1d(x, y, kind = "cubic")
+        X_=np.linspace(x.min(), x.max(), 500)
+        Y_= cubic_interpolation_model(X_)
+    else:
+        # a cubic interpolation needs at least 4 points, the few scores of a short run are joined by lines
+        X_, Y_ = x, y
+
+    plt.plot(X_, Y_, marker='o' if len(x) < 4 else None)
+    plt.title("Decrypted Ciphertext across iterations")
+    plt.xlabel("Iterations")
+    plt.ylabel("Decryption score")
+    plt.savefig("states/hillclimbing.png")
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+import hashlib
+
+# Approximate memory held by one entry (key tuple, its two bytes objects, the float and the
+# OrderedDict bookkeeping), measured with tracemalloc on CPython 3.11
+ENTRY_BYTES = 256
+
+def cipher_identity(cipher_codes):
+    '''
+    This function names a ciphertext in the cache.
+    Args:
+        cipher_codes (np.ndarray): The letter codes of the ciphertext (see HillClimbing.encode)
+    Return:
+        An 8-byte digest of the codes
+    '''
+    return hashlib.blake2b(cipher_codes.tobytes(), digest_size=8).digest()
+
+class ScoreCache:
+
+    def __init__(self, max_bytes = 64 << 20):
+        '''
+        This is the initialising constructor.
+        self.entries (OrderedDict): The score of every cached (ciphertext, key), least recently used first.
+        self.hits, self.misses, self.evictions (int): The counters of the lookups and of the entries dropped.
+        Args:
+            max_bytes (int): default 64 MB, the approximate memory the entries may hold
+        '''
+        self.entries = OrderedDict()
+        self.max_bytes = max_bytes
+        self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cipher_id, key_bytes):
+        '''
+        This function looks up the score of a key.
+        Args:
+            cipher_id (bytes): The identity of the ciphertext (see cipher_identity)
+            key_bytes (bytes): The packed key (see Key.to_bytes)
+        Return:
+            The cached score, None if missing
+        '''
+        score = self.entries.get((cipher_id, key_bytes))
+        if score is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end((cipher_id, key_bytes))
+        self.hits += 1
+        return score
+
+    def put(self, cipher_id, key_bytes, score):
+        '''
+        This function caches the score of a key, evicting the least recently used entry if the cache is full.
+        Args:
+            cipher_id (bytes): The identity of the ciphertext (see cipher_identity)
+            key_bytes (bytes): The packed key (see Key.to_bytes)
+            score (float): Its score
+        '''
+        self.entries[(cipher_id, key_bytes)] = score
+        self.entries.move_to_end((cipher_id, key_bytes))
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def snapshot(self):
+        '''
+        This function returns the counters of the cache.
+        Return:
+            A dict: entries, approximate bytes, hits, misses, evictions and hit rate
+        '''
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'bytes': len(self.entries) * ENTRY_BYTES, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,277 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from cipher import CaesarCipher, read_message
+from hill_climb import HillClimbing, solve_quad
+from strategies import STRATEGIES
+
+METHODS = ('frequency', 'bigram', 'quad')
+
+# Seconds a quad job may overrun its deadline (the restart in flight seeing it and the result coming back)
+# before it is reported as failed
+DEADLINE_GRACE = 1.0
+
+# quadgram scorer of a worker process, loaded once by init_worker
+_worker = {}
+
+def init_worker(quadgrams = 'frequencies/english_quadgrams.txt'):
+    '''
+    This function loads the quadgram table, once per worker process.
+    Args:
+        quadgrams (str): The 'NGRAM count' file of the quadgram scores
+    '''
+    _worker['scorer'] = HillClimbing(quadgrams)
+
+def solve_job(cipher, options, expires):
+    '''
+    This function runs one quad job in a worker process.
+    Args:
+        cipher (str): The ciphertext, in upper case
+        options (dict): 'restarts', 'seed' and 'strategy' of the job
+        expires (float): The wall-clock time (time.time()) by which the job has to be done
+    Return:
+        The result as a dict which can be dumped as JSON
+    '''
+    time_limit = expires - time.time()
+    if time_limit <= 0:
+        raise TimeoutError('deadline exceeded before the job started')
+    result = solve_quad(cipher, scorer=_worker['scorer'], seed=options.get('seed'),
+                        restarts=options.get('restarts', 10), time_limit=time_limit,
+                        strategy=STRATEGIES[options.get('strategy', 'anneal')]())
+    return {'key': ''.join(result.key), 'score': result.score, 'plaintext': result.plaintext.lower(),
+            'restarts': result.restarts, 'stop_reason': result.stop_reason}
+
+class CrackService:
+
+    def __init__(self, window = 0.005, max_batch = 4096, deadline = 30.0, workers = None,
+                 frequency_file = 'frequencies/letter_frequencies.csv', bigram_file = 'frequencies/bigram_frequency.csv',
+                 quadgrams = 'frequencies/english_quadgrams.txt'):
+        '''
+        This is the initialising constructor. The tables are loaded here, once for every request.
+        self.pending (dictionary): The Caesar requests waiting to be cracked, by (method, weighting).
+        self.timers (dictionary): The scheduled flush of every pending batch.
+        Args:
+            window (float): default 0.005, the seconds Caesar requests are gathered for before being cracked together
+            max_batch (int): default 4096, the number of gathered requests which triggers the crack at once
+            deadline (float): default 30, the seconds a quad job may take unless the request sets its own
+            workers (int): The number of processes running quad jobs, None for one per core
+            frequency_file (str): The letter frequency CSV of the Caesar requests
+            bigram_file (str): The bigram frequency CSV of the Caesar requests
+            quadgrams (str): The quadgram counts of the quad jobs
+        '''
+        self.cipher_obj = CaesarCipher(frequency_file=frequency_file, bigram_file=bigram_file)
+        self.window = window
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self.pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(quadgrams,))
+        self.pending = {}
+        self.timers = {}
+
+    async def crack_caesar(self, text, method, weighting):
+        '''
+        This function queues a Caesar request and waits for the batch it is cracked with.
+        Args:
+            text (str): The ciphertext
+            method (str): 'frequency' or 'bigram'
+            weighting (str): 'presence' or 'count', the bigram weighting
+        Return:
+            The result as a dict: shift, score, confidence, plaintext and the size of the batch
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (method, weighting)
+        batch = self.pending.setdefault(key, [])
+        batch.append((text, future))
+        if len(batch) == 1:
+            self.timers[key] = loop.call_later(self.window, self.flush, key)
+        elif len(batch) >= self.max_batch:
+            self.flush(key)
+        return await future
+
+    def flush(self, key):
+        '''
+        This function cracks the pending batch of a method with one call to crack_many.
+        Args:
+            key (tuple): The method and weighting of the batch
+        '''
+        batch = self.pending.pop(key, [])
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if not batch:
+            return
+        try:
+            results = self.cipher_obj.crack_many([text for text, _ in batch], *key)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (text, future), (n, score, confidence) in zip(batch, results):
+            if not future.done():
+                future.set_result({'shift': n, 'score': score, 'confidence': confidence,
+                                   'plaintext': self.cipher_obj.decode_caesar(text, n) if n >= 0 else text,
+                                   'batch': len(batch)})
+
+    async def crack_quad(self, text, options):
+        '''
+        This function runs a quad job on the process pool within its deadline. A job still queued
+        at its deadline is never started.
+        Args:
+            text (str): The ciphertext
+            options (dict): 'deadline', 'restarts', 'seed' and 'strategy' of the job
+        Return:
+            The result as a dict: key, score, plaintext, restarts and stop_reason
+        '''
+        deadline = float(options.get('deadline', self.deadline))
+        loop = asyncio.get_running_loop()
+        job = loop.run_in_executor(self.pool, solve_job, text.upper(), options, time.time() + deadline)
+        try:
+            return await asyncio.wait_for(job, deadline + DEADLINE_GRACE)
+        except asyncio.TimeoutError:
+            raise TimeoutError('deadline exceeded') from None
+
+    async def answer(self, line):
+        '''
+        This function answers one request.
+        Args:
+            line (bytes): The request, a JSON object with 'method' ('frequency', 'bigram' or 'quad'),
+                'cipher' and optionally 'id', 'weighting', 'deadline', 'restarts', 'seed' and 'strategy'
+        Return:
+            The response, a JSON object holding the 'id' of the request and either the result or an 'error'
+        '''
+        response = {}
+        try:
+            request = json.loads(line)
+            response['id'] = request.get('id')
+            method = request.get('method', 'frequency')
+            text = request.get('cipher')
+            # requests are checked before being queued, so that a bad one cannot fail its whole batch
+            if method not in METHODS:
+                raise ValueError(f"Unknown cracking method: {method}")
+            if not isinstance(text, str):
+                raise TypeError("The 'cipher' of a request must be a string")
+            if method == 'quad':
+                if request.get('strategy', 'anneal') not in STRATEGIES:
+                    raise ValueError(f"Unknown strategy: {request['strategy']}")
+                response.update(await self.crack_quad(text, request))
+            else:
+                weighting = request.get('weighting', 'presence')
+                if weighting not in ('presence', 'count'):
+                    raise ValueError(f"Unknown bigram weighting: {weighting}")
+                response.update(await self.crack_caesar(text, method, weighting))
+        except Exception as e:
+            response['error'] = f"{type(e).__name__}: {e}"
+        return json.dumps(response).encode() + b'\n'
+
+    async def handle(self, reader, writer):
+        '''
+        This function serves one connection: every line is a request, answered as soon as it is cracked,
+        so that the requests of one client are coalesced with each other and with those of other clients.
+        Args:
+            reader (asyncio.StreamReader): The incoming requests
+            writer (asyncio.StreamWriter): The outgoing responses
+        '''
+        async def respond(line):
+            writer.write(await self.answer(line))
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    def close(self):
+        '''
+        This function stops the worker processes.
+        '''
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+async def serve(host, port, **options):
+    '''
+    This function runs the service until interrupted or terminated.
+    Args:
+        host (str): The address to listen on
+        port (int): The port to listen on
+        options: The arguments of CrackService
+    '''
+    service = CrackService(**options)
+    server = await asyncio.start_server(service.handle, host, port)
+    # a terminated service stops like an interrupted one
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    print(f"Serving on {host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        service.close()
+
+async def request_many(host, port, requests):
+    '''
+    This function sends requests over one connection, all at once, and collects the responses.
+    Args:
+        host (str): The address of the service
+        port (int): The port of the service
+        requests (list): The requests as dicts
+    Return:
+        The responses as dicts, in the order they arrived
+    '''
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.writelines(json.dumps(request).encode() + b'\n' for request in requests)
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the cracking methods as JSON Lines over TCP, or send files to the service")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help="Address to listen on or to connect to")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on or to connect to")
+    parser.add_argument('--window', type=float, default=0.005, help="Seconds Caesar requests are gathered for before being cracked together")
+    parser.add_argument('--deadline', type=float, default=30.0, help="Default seconds allowed to a quad job")
+    parser.add_argument('-j', '--workers', type=int, default=0, help="Number of processes running quad jobs (0 for one per core)")
+    parser.add_argument('--frequency-file', type=str, default='frequencies/letter_frequencies.csv',
+                        help="Letter frequency CSV of the frequency requests (see build_model.py)")
+    parser.add_argument('--bigram-file', type=str, default='frequencies/bigram_frequency.csv',
+                        help="Bigram frequency CSV of the bigram requests (see build_model.py)")
+    parser.add_argument('--quadgrams', type=str, default='frequencies/english_quadgrams.txt',
+                        help="Quadgram counts of the quad requests (see build_model.py)")
+    parser.add_argument('--client', nargs='+', metavar='FILE', help="Send the ciphertext of every file to the running service and print the responses")
+    parser.add_argument('-m', '--method', choices=METHODS, default='frequency', help="Cracking method of the client requests")
+    args = parser.parse_args()
+
+    if args.client:
+        requests = []
+        for file_name in args.client:
+            if args.method == 'quad':
+                with open(file_name) as f:
+                    text = f.read().strip()
+            else:
+                text = read_message(file_name)
+            requests.append({'id': file_name, 'method': args.method, 'cipher': text, 'deadline': args.deadline})
+        for response in asyncio.run(request_many(args.host, args.port, requests)):
+            print(json.dumps(response))
+    else:
+        # the quadgram table is loaded by the worker processes, where a missing file would break the pool
+        if not os.path.isfile(args.quadgrams):
+            parser.error(f"no such table file: {args.quadgrams}")
+        try:
+            asyncio.run(serve(args.host, args.port, window=args.window, deadline=args.deadline,
+                              workers=args.workers or None, frequency_file=args.frequency_file,
+                              bigram_file=args.bigram_file, quadgrams=args.quadgrams))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,217 @@
+from math import exp, log
+import string
+import time
+from keys import Key
+
+# Swaps tried between two looks at the clock when a search has a deadline
+DEADLINE_EVERY = 256
+
+def expired(expires):
+    '''
+    This function tells if the deadline of a search is passed.
+    Args:
+        expires (float): The wall-clock time (time.time()) at which to stop, None for no deadline
+    Return:
+        True once the deadline is passed
+    '''
+    return expires is not None and time.time() >= expires
+
+def random_key(rng):
+    '''
+    This function draws a random key.
+    Args:
+        rng (random.Random): The source of randomness
+    Return:
+        The Key of the 26 upper case letters in a random order
+    '''
+    letters = list(string.ascii_uppercase)
+    rng.shuffle(letters)
+    return Key(letters)
+
+def metropolis_step(evaluator, rng, temperature):
+    '''
+    This function tries one random swap of the key and accepts it with the Metropolis criterion:
+    always if the score does not decrease, else with probability exp(delta / temperature).
+    A draw of the same position twice is skipped.
+    Args:
+        evaluator (SwapEvaluator): The evaluator holding the current key
+        rng (random.Random): The source of randomness
+        temperature (float): The current temperature
+    '''
+    i = rng.randint(0, 25)
+    j = rng.randint(0, 25)
+    if i == j:
+        # swapping a letter with itself is no move: it is neither tried nor accepted
+        return
+    delta = evaluator.swap_delta(i, j)
+    if delta >= 0 or rng.random() < exp(delta / temperature):
+        evaluator.apply_swap(i, j, delta)
+
+def polish(evaluator):
+    '''
+    This function climbs from the key of the evaluator to a key no single swap improves, making the
+    best of the 325 swaps at every step.
+    Args:
+        evaluator (SwapEvaluator): The evaluator holding the key to be improved
+    Return:
+        The number of score evaluations made
+    '''
+    start = evaluator.evaluations
+    while True:
+        best_delta, best_swap = 0, None
+        for i in range(25):
+            for j in range(i + 1, 26):
+                delta = evaluator.swap_delta(i, j)
+                if delta > best_delta:
+                    best_delta, best_swap = delta, (i, j)
+        if best_swap is None:
+            return evaluator.evaluations - start
+        evaluator.apply_swap(*best_swap, best_delta)
+
+class HillClimb:
+
+    def __init__(self, max_iter = 1000):
+        '''
+        This is the initialising constructor.
+        Args:
+            max_iter (int): default 1000, the number of swaps tried per restart
+        '''
+        self.max_iter = max_iter
+
+    def search(self, evaluator, rng, expires = None):
+        '''
+        This function performs one restart, accepting only the swaps which improve the score.
+        Args:
+            evaluator (SwapEvaluator): The evaluator of the ciphertext
+            rng (random.Random): The source of the initial key and of the swaps
+            expires (float): The wall-clock time (time.time()) at which to stop early, none by default
+        Return:
+            The score reached, the corresponding key and the number of score evaluations
+        '''
+        start = evaluator.evaluations
+        evaluator.set_key(random_key(rng))
+
+        for step in range(self.max_iter):
+            if step % DEADLINE_EVERY == 0 and expired(expires):
+                break
+            i = rng.randint(0, 25)
+            j = rng.randint(0, 25)
+            delta = evaluator.swap_delta(i, j)
+
+            if delta > 0:
+                #swap parent node and child if child score is better
+                evaluator.apply_swap(i, j, delta)
+
+        return evaluator.score, evaluator.key.copy(), evaluator.evaluations - start
+
+class SimulatedAnnealing:
+
+    SCHEDULES = ('exponential', 'linear', 'logarithmic')
+
+    def __init__(self, steps = 5000, t_start = 20.0, t_end = 0.2, schedule = 'exponential'):
+        '''
+        This is the initialising constructor.
+        Args:
+            steps (int): default 5000, the number of swaps tried per restart
+            t_start (float): default 20, the initial temperature
+            t_end (float): default 0.2, the final temperature (not used by the logarithmic schedule)
+            schedule (str): 'exponential', 'linear' or 'logarithmic' cooling
+        '''
+        if schedule not in self.SCHEDULES:
+            raise ValueError(f"Unknown cooling schedule: {schedule}")
+        self.steps = steps
+        self.t_start = t_start
+        self.t_end = t_end
+        self.schedule = schedule
+
+    def temperature(self, step):
+        '''
+        This function computes the temperature of a step of the cooling schedule.
+        Args:
+            step (int): The step, from 0 to steps - 1
+        Return:
+            The temperature
+        '''
+        if self.schedule == 'logarithmic':
+            return self.t_start * log(2) / log(2 + step)
+        fraction = step / max(self.steps - 1, 1)
+        if self.schedule == 'linear':
+            return self.t_start + (self.t_end - self.t_start) * fraction
+        return self.t_start * (self.t_end / self.t_start) ** fraction
+
+    def search(self, evaluator, rng, expires = None):
+        '''
+        This function performs one restart of simulated annealing, worse keys being accepted
+        less and less often as the temperature falls.
+        Args:
+            evaluator (SwapEvaluator): The evaluator of the ciphertext
+            rng (random.Random): The source of the initial key and of the swaps
+            expires (float): The wall-clock time (time.time()) at which to stop early, none by default
+        Return:
+            The best score met, the corresponding key and the number of score evaluations
+        '''
+        start = evaluator.evaluations
+        evaluator.set_key(random_key(rng))
+        best_score, best_key = evaluator.score, evaluator.key.copy()
+
+        for step in range(self.steps):
+            if step % DEADLINE_EVERY == 0 and expired(expires):
+                break
+            metropolis_step(evaluator, rng, self.temperature(step))
+            if evaluator.score > best_score:
+                best_score, best_key = evaluator.score, evaluator.key.copy()
+
+        return best_score, best_key, evaluator.evaluations - start
+
+class ParallelTempering:
+
+    def __init__(self, temperatures = (1.0, 2.0, 4.0, 8.0, 16.0), steps = 1500, exchange_every = 10):
+        '''
+        This is the initialising constructor.
+        Args:
+            temperatures (tuple): The temperature of every replica, in increasing order
+            steps (int): default 1500, the number of swaps tried per replica and restart
+            exchange_every (int): default 10, the number of swaps between two exchange attempts
+        '''
+        self.temperatures = tuple(temperatures)
+        self.steps = steps
+        self.exchange_every = exchange_every
+
+    def search(self, evaluator, rng, expires = None):
+        '''
+        This function performs one restart of parallel tempering: one Metropolis chain per temperature,
+        neighbouring chains exchanging their keys so that good keys found while hot can be refined cold.
+        Args:
+            evaluator (SwapEvaluator): The evaluator of the ciphertext, cloned for the other replicas
+            rng (random.Random): The source of the initial keys, swaps and exchanges
+            expires (float): The wall-clock time (time.time()) at which to stop early, none by default
+        Return:
+            The best score met, the corresponding key and the number of score evaluations
+        '''
+        # the clones share the counters of the evaluator
+        replicas = [evaluator] + [evaluator.clone() for _ in self.temperatures[1:]]
+        start = evaluator.evaluations
+        for replica in replicas:
+            replica.set_key(random_key(rng))
+        best = max(replicas, key=lambda replica: replica.score)
+        best_score, best_key = best.score, best.key.copy()
+
+        for _ in range(self.steps // self.exchange_every):
+            # a round is only exchange_every swaps of every replica, the clock is looked at every round
+            if expired(expires):
+                break
+            for replica, temperature in zip(replicas, self.temperatures):
+                for _ in range(self.exchange_every):
+                    metropolis_step(replica, rng, temperature)
+                if replica.score > best_score:
+                    best_score, best_key = replica.score, replica.key.copy()
+
+            for k in range(len(replicas) - 1):
+                cold, hot = replicas[k], replicas[k + 1]
+                x = (1 / self.temperatures[k] - 1 / self.temperatures[k + 1]) * (hot.score - cold.score)
+                if x >= 0 or rng.random() < exp(x):
+                    replicas[k], replicas[k + 1] = hot, cold
+
+        return best_score, best_key, evaluator.evaluations - start
+
+STRATEGIES = {'hill': HillClimb, 'anneal': SimulatedAnnealing, 'tempering': ParallelTempering}
@@ -0,0 +1,156 @@
+from math import log10
+import argparse
+import glob
+import hashlib
+import os
+import numpy as np
+
+# Bumped whenever the layout of a compiled table changes, which invalidates every cached file
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join('frequencies', '.cache')
+
+# Number of entries ahead of the log probabilities in a compiled n-gram table
+NGRAM_HEADER = 3
+
+def compile_csv(file_name):
+    '''
+    This function compiles a 'key,value' CSV file (letter or bigram frequencies).
+    Args:
+        file_name (str): The CSV file
+    Return:
+        A structured array of (key, value) rows, the keys in lower case
+    '''
+    rows = []
+    with open(file_name) as f:
+        for line in f:
+            line = line.lower().replace("\n", "")
+            # the key may be a comma itself, the value never holds one
+            k, v = line.rsplit(",", 1)
+            rows.append((k, float(v)))
+    return np.array(rows, dtype=[('key', 'U2'), ('value', 'f8')])
+
+def compile_ngrams(file_name):
+    '''
+    This function compiles a 'NGRAM count' file (such as english_quadgrams.txt) into a dense table of
+    log probabilities indexed by the base-26 value of the n-gram, unseen n-grams holding the floor value.
+    Args:
+        file_name (str): The n-gram file
+    Return:
+        A float array: n, the total count and the floor value (the NGRAM_HEADER entries),
+        followed by the 26^n log probabilities
+    '''
+    with open(file_name) as f:
+        tokens = f.read().split()
+    keys = tokens[0::2]
+    counts = np.array(tokens[1::2], dtype=float)
+    length = len(keys[0])
+    total = counts.sum()
+    floor = log10(0.01/total)
+
+    letters = np.frombuffer(''.join(keys).encode(), dtype=np.uint8).reshape(-1, length) - ord('A')
+    idx = letters.astype(np.intp) @ (26 ** np.arange(length - 1, -1, -1))
+    table = np.full(NGRAM_HEADER + 26 ** length, floor)
+    table[:NGRAM_HEADER] = (length, total, floor)
+    table[NGRAM_HEADER + idx] = np.log10(counts/total)
+    return table
+
+COMPILERS = {'csv': compile_csv, 'ngrams': compile_ngrams}
+
+TABLES = [
+    ('frequencies/letter_frequencies.csv', 'csv'),
+    ('frequencies/bigram_frequency.csv', 'csv'),
+    ('frequencies/english_quadgrams.txt', 'ngrams'),
+]
+
+def source_digest(file_name):
+    '''
+    This function hashes the content of a source table.
+    Args:
+        file_name (str): The source file
+    Return:
+        The first 16 hexadecimal digits of its SHA-256
+    '''
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def cache_prefix(file_name, kind):
+    '''
+    This function gives the part of the compiled table names shared by every version of a source table:
+    its name and a hash of its full path, so that sources of the same name in different directories
+    never share (or remove) each other's compiled files.
+    Args:
+        file_name (str): The source file
+        kind (str): 'csv' or 'ngrams'
+    Return:
+        The path prefix of the .npy files
+    '''
+    location = hashlib.sha256(os.path.realpath(file_name).encode()).hexdigest()[:8]
+    return os.path.join(CACHE_DIR, f"{os.path.basename(file_name)}.{location}.{kind}")
+
+def cache_path(file_name, kind):
+    '''
+    This function names the compiled form of a source table, keyed by the layout version and the
+    hash of the source so that an edited source or a new layout never reads a stale file.
+    Args:
+        file_name (str): The source file
+        kind (str): 'csv' or 'ngrams'
+    Return:
+        The path of the .npy file
+    '''
+    return f"{cache_prefix(file_name, kind)}.v{CACHE_VERSION}.{source_digest(file_name)}.npy"
+
+def compile_table(file_name, kind):
+    '''
+    This function compiles a source table into the cache, removing its stale compiled versions.
+    Args:
+        file_name (str): The source file
+        kind (str): 'csv' or 'ngrams'
+    Return:
+        The path of the compiled table
+    '''
+    path = cache_path(file_name, kind)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, COMPILERS[kind](file_name))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    for stale in glob.glob(f"{glob.escape(cache_prefix(file_name, kind))}.*.npy"):
+        if stale != path:
+            os.remove(stale)
+    return path
+
+def load_table(file_name, kind):
+    '''
+    This function loads a table through its compiled form, compiling it first if the cache is missing
+    or stale. The compiled table is memory-mapped read-only, so that loading costs next to nothing and
+    the pages are shared by every process using it.
+    Args:
+        file_name (str): The source file
+        kind (str): 'csv' or 'ngrams'
+    Return:
+        The compiled array (see compile_csv and compile_ngrams)
+    '''
+    try:
+        path = cache_path(file_name, kind)
+        if not os.path.exists(path):
+            path = compile_table(file_name, kind)
+        return np.load(path, mmap_mode='r')
+    except OSError:
+        # no usable cache directory, compile in memory
+        return COMPILERS[kind](file_name)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile the frequency and n-gram tables into the binary cache")
+    parser.add_argument('files', nargs='*', help="Tables to compile as FILE:KIND (KIND being csv or ngrams), the shipped tables by default")
+    args = parser.parse_args()
+    tables = [tuple(item.rsplit(':', 1)) for item in args.files] or TABLES
+    for file_name, kind in tables:
+        print(compile_table(file_name, kind))